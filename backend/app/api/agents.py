@@ -2,11 +2,13 @@
 Agent CRUD API endpoints
 """
 
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from uuid import UUID
-from ..database import get_db
+from ..database import get_async_db
 from ..models.agent import Agent
 from ..schemas.agent import AgentCreate, AgentUpdate, AgentResponse
 from ..langgraph.agent_runtime import runtime
@@ -17,22 +19,23 @@ router = APIRouter()
 @router.get("/agents", response_model=List[AgentResponse])
 async def list_agents(
     organization_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """List all agents for organization"""
-    agents = db.query(Agent).filter(
-        Agent.organization_id == organization_id
-    ).all()
-    return agents
+    result = await db.execute(
+        select(Agent).where(Agent.organization_id == organization_id)
+    )
+    return result.scalars().all()
 
 
 @router.get("/agents/{agent_id}", response_model=AgentResponse)
 async def get_agent(
     agent_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get agent by ID"""
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    result = await db.execute(select(Agent).where(Agent.id == agent_id))
+    agent = result.scalars().first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return agent
@@ -41,7 +44,7 @@ async def get_agent(
 @router.post("/agents", response_model=AgentResponse)
 async def create_agent(
     agent_data: AgentCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create new agent"""
     # Create agent model
@@ -88,8 +91,8 @@ async def create_agent(
     )
     
     db.add(agent)
-    db.commit()
-    db.refresh(agent)
+    await db.commit()
+    await db.refresh(agent)
     
     return agent
 
@@ -98,10 +101,11 @@ async def create_agent(
 async def update_agent(
     agent_id: str,
     agent_data: AgentUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update agent"""
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    result = await db.execute(select(Agent).where(Agent.id == agent_id))
+    agent = result.scalars().first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
@@ -118,8 +122,8 @@ async def update_agent(
                 setattr(agent, key, value)
         agent.config_json = config_dict
     
-    db.commit()
-    db.refresh(agent)
+    await db.commit()
+    await db.refresh(agent)
     
     # Invalidate runtime cache
     runtime.invalidate_cache(str(agent_id))
@@ -130,15 +134,16 @@ async def update_agent(
 @router.delete("/agents/{agent_id}")
 async def delete_agent(
     agent_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete agent"""
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    result = await db.execute(select(Agent).where(Agent.id == agent_id))
+    agent = result.scalars().first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    db.delete(agent)
-    db.commit()
+    await db.delete(agent)
+    await db.commit()
     
     # Invalidate runtime cache
     runtime.invalidate_cache(str(agent_id))
@@ -149,20 +154,42 @@ async def delete_agent(
 @router.post("/agents/{agent_id}/publish", response_model=AgentResponse)
 async def publish_agent(
     agent_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Publish agent"""
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    result = await db.execute(select(Agent).where(Agent.id == agent_id))
+    agent = result.scalars().first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     agent.is_published = True
     agent.version += 1
     
-    db.commit()
-    db.refresh(agent)
+    await db.commit()
+    await db.refresh(agent)
     
     # Invalidate runtime cache
     runtime.invalidate_cache(str(agent_id))
     
+    # Synthesize fixed phrases (greeting, voicemail, backchannels) up front
+    _schedule_tts_prewarm(agent.config_json or {})
+    
     return agent
+
+
+# Background prewarm tasks; the loop only keeps weak references to tasks
+_prewarm_tasks: set = set()
+
+
+def _schedule_tts_prewarm(config: dict):
+    """Fill the TTS cache for a voice agent in the background"""
+    if not config.get("voice_provider"):
+        return
+    try:
+        from ..voice.tts import prewarm_tts
+    except Exception as e:
+        print(f"⚠️  TTS prewarm skipped: {e}")
+        return
+    task = asyncio.create_task(prewarm_tts(config))
+    _prewarm_tasks.add(task)
+    task.add_done_callback(_prewarm_tasks.discard)
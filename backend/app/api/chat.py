@@ -2,21 +2,34 @@
 Chat API endpoints
 """
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from ..database import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import get_async_db, AsyncSessionLocal
 from ..schemas.agent import ChatMessage, ChatResponse
 from ..langgraph.agent_runtime import runtime
+from ..langgraph.turn_queue import TurnQueueFull
 import json
 
 router = APIRouter()
 
 
+def _queue_full_frame(e: TurnQueueFull) -> dict:
+    """Error frame for a session with too many queued turns"""
+    return {
+        "type": "error",
+        "message": str(e),
+        "code": "turn_queue_full",
+        "retry_after": settings.TURN_QUEUE_RETRY_AFTER_SECONDS
+    }
+
+
 @router.post("/chat/{agent_id}/message", response_model=ChatResponse)
 async def send_message(
     agent_id: str,
     message_data: ChatMessage,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send text message to agent with session management"""
     try:
@@ -31,6 +44,12 @@ async def send_message(
             metadata=metadata
         )
         return result
+    except TurnQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(settings.TURN_QUEUE_RETRY_AFTER_SECONDS)}
+        )
     except Exception as e:
         return ChatResponse(
             response=f"Error: {str(e)}",
@@ -38,6 +57,43 @@ async def send_message(
         )
 
 
+@router.post("/chat/{agent_id}/message/stream")
+async def send_message_stream(
+    agent_id: str,
+    message_data: ChatMessage
+):
+    """Send text message to agent and stream the reply as Server-Sent Events"""
+    metadata = getattr(message_data, 'metadata', {})
+    
+    async def event_stream():
+        # The response outlives the request scope, so own the DB session here
+        async with AsyncSessionLocal() as db:
+            try:
+                async for event in runtime.execute_text_stream(
+                    agent_id=agent_id,
+                    user_input=message_data.message,
+                    session_id=message_data.session_id,
+                    db=db,
+                    metadata=metadata
+                ):
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            except TurnQueueFull as e:
+                # Headers are already sent; the frame carries the retry hint
+                yield f"event: error\ndata: {json.dumps(_queue_full_frame(e))}\n\n"
+            except Exception as e:
+                error = {"type": "error", "message": str(e)}
+                yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.websocket("/ws/chat/{agent_id}")
 async def websocket_chat(
     websocket: WebSocket,
@@ -47,7 +103,7 @@ async def websocket_chat(
     await websocket.accept()
     
     # Get database session
-    db = next(get_db())
+    db = AsyncSessionLocal()
     
     try:
         while True:
@@ -57,6 +113,7 @@ async def websocket_chat(
             
             message = message_data.get("message")
             session_id = message_data.get("session_id")
+            stream = message_data.get("stream", True)
             
             if not session_id:
                 await websocket.send_json({
@@ -67,6 +124,17 @@ async def websocket_chat(
             
             # Execute agent
             try:
+                if stream:
+                    # Token frames followed by the final message frame
+                    async for event in runtime.execute_text_stream(
+                        agent_id=agent_id,
+                        user_input=message,
+                        session_id=session_id,
+                        db=db
+                    ):
+                        await websocket.send_json(event)
+                    continue
+                
                 result = await runtime.execute_text(
                     agent_id=agent_id,
                     user_input=message,
@@ -80,7 +148,11 @@ async def websocket_chat(
                     "content": result["response"],
                     "metadata": result["metadata"]
                 })
+            except TurnQueueFull as e:
+                await websocket.send_json(_queue_full_frame(e))
             except Exception as e:
+                # Keep the connection's session usable for the next turn
+                await db.rollback()
                 await websocket.send_json({
                     "type": "error",
                     "message": str(e)
@@ -89,4 +161,4 @@ async def websocket_chat(
     except WebSocketDisconnect:
         print(f"Client disconnected from agent {agent_id}")
     finally:
-        db.close()
+        await db.close()
@@ -0,0 +1,85 @@
+"""
+Knowledge base API endpoints
+"""
+
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, UploadFile
+from collections import OrderedDict
+from typing import List
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from ..langgraph.knowledge import kb_service
+from ..services.ingestion_service import IngestionService, iter_documents
+
+router = APIRouter()
+
+# Recent ingestion jobs (in-memory, per worker)
+ingestion_jobs: "OrderedDict[str, dict]" = OrderedDict()
+MAX_TRACKED_JOBS = 100
+
+
+async def run_ingestion(job_id: str, kb_id: str, upload_dir: str):
+    """Background task: ingest spooled uploads, then remove them"""
+    job = ingestion_jobs[job_id]
+    job["status"] = "running"
+    try:
+        await IngestionService().ingest(kb_id, iter_documents(upload_dir), progress=job)
+        job["status"] = "completed"
+    except Exception as e:
+        print(f"❌ Ingestion job {job_id} failed: {e}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+@router.post("/knowledge/{kb_id}/ingest", status_code=202)
+async def ingest_knowledge_base(
+    kb_id: str,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...)
+):
+    """
+    Ingest documents into a knowledge base.
+    Accepts .jsonl (one {"text", "metadata"} object per line) and text files.
+    """
+    if kb_service.backend is None:
+        raise HTTPException(status_code=503, detail="Knowledge base vector store not configured")
+
+    # Spool uploads to disk so ingestion can stream them after we respond
+    upload_dir = tempfile.mkdtemp(prefix=f"kb-{kb_id}-")
+    for upload in files:
+        name = os.path.basename(upload.filename or "upload.txt")
+        # A uuid directory per upload keeps same-named files apart while the
+        # file name stays the chunks' source for re-ingestion
+        upload_path = os.path.join(upload_dir, uuid.uuid4().hex, name)
+        os.makedirs(os.path.dirname(upload_path))
+        with open(upload_path, "wb") as out:
+            await asyncio.to_thread(shutil.copyfileobj, upload.file, out)
+
+    job_id = str(uuid.uuid4())
+    ingestion_jobs[job_id] = {"job_id": job_id, "kb_id": kb_id, "status": "queued"}
+    while len(ingestion_jobs) > MAX_TRACKED_JOBS:
+        ingestion_jobs.popitem(last=False)
+
+    background_tasks.add_task(run_ingestion, job_id, kb_id, upload_dir)
+    return ingestion_jobs[job_id]
+
+
+@router.get("/knowledge/ingest/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get ingestion job progress"""
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+
+@router.post("/knowledge/{kb_id}/invalidate")
+async def invalidate_knowledge_base(kb_id: str):
+    """Drop cached retrieval results for a knowledge base after it changed"""
+    # Per worker; other workers catch up within KB_RESULT_CACHE_TTL_SECONDS
+    kb_service.invalidate(kb_id)
+    return {"message": "Knowledge base cache invalidated", "kb_id": kb_id}
@@ -1,77 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..services.call_log_writer import call_log_writer
 from ..services.livekit_service import LiveKitService
+from ..services.phone_routing import phone_routing
 from ..models.agent import Agent
-from ..workers.voice_agent import VoiceAgent
+from ..workers.dispatch import NoVoiceWorkerAvailable, voice_dispatcher
 import uuid
 import json
-import asyncio
 
 router = APIRouter()
 
-# Keep track of active agents (in-memory for MVP, use Redis for production)
-active_voice_agents = {}
-
-async def start_voice_agent(room_name: str, agent_id: str, db: Session):
-    """
-    Background task to start the VoiceAgent for a room.
-    """
-    # Create a new DB session for the worker since the request session will close
-    # Note: In a real app, handle session lifecycle better or pass a session factory
-    # For now, we'll assume the worker manages its own short-lived sessions or we pass the ID
-    
-    # We need to pass a session factory or create a new session here. 
-    # Since we can't easily pass the session factory, we'll skip DB for now in the worker init
-    # or assume the worker creates one.
-    
-    # Actually, VoiceAgent takes a db_session. Let's fix VoiceAgent to take a session factory or just IDs.
-    # For this MVP, we will instantiate it.
-    
-    print(f"🚀 Spawning VoiceAgent for room {room_name}")
-    agent = VoiceAgent(room_name, agent_id, db) # Warning: db session might be closed
-    active_voice_agents[room_name] = agent
-    await agent.start()
-
 @router.post("/voice/sip/inbound")
 async def handle_sip_inbound(
-    background_tasks: BackgroundTasks,
     caller_id: str = Form(None),
     called_number: str = Form(...),
-    trunk_id: str = Form(None),
-    db: Session = Depends(get_db)
+    trunk_id: str = Form(None)
 ):
     """
     Webhook called by LiveKit SIP Ingress when a call is received.
     """
     print(f"📞 Inbound SIP Call: {caller_id} -> {called_number}")
 
-    # 1. Lookup Phone Number -> Agent & Organization
-    query = text("""
-        SELECT 
-            pn.id as phone_id,
-            pn.agent_id,
-            pn.organization_id,
-            o.credits_balance
-        FROM phone_numbers pn
-        JOIN organizations o ON pn.organization_id = o.id
-        WHERE pn.phone_number = :number AND pn.status = 'active'
-    """)
-    
-    result = db.execute(query, {"number": called_number}).first()
+    # 1. Lookup Phone Number -> Agent & Organization (in-memory routing table)
+    route = await phone_routing.lookup(called_number)
     
-    if not result:
+    if not route or route.status != "active":
         print(f"❌ Number not found: {called_number}")
         raise HTTPException(status_code=404, detail="Phone number not configured")
         
-    phone_id, agent_id, org_id, credits = result
+    phone_id = route.phone_id
+    agent_id = route.agent_id
+    org_id = route.organization_id
+    credits = route.credits_balance
     
     if not agent_id:
         print(f"❌ No agent assigned to number: {called_number}")
         raise HTTPException(status_code=404, detail="No agent assigned")
         
-    # 2. Check Credits
+    # 2. Check Credits (as of the last routing table reload)
     if credits <= 0:
         print(f"❌ Insufficient credits for org {org_id}")
         raise HTTPException(status_code=402, detail="Insufficient credits")
@@ -80,25 +48,24 @@ async def handle_sip_inbound(
     session_id = str(uuid.uuid4())
     room_name = f"sip-{agent_id}-{session_id}"
 
-    # 4. Log Call Start
-    log_query = text("""
-        INSERT INTO call_logs (organization_id, agent_id, phone_number_id, session_id, direction, caller_number, status)
-        VALUES (:org_id, :agent_id, :phone_id, :session_id, 'inbound', :caller, 'active')
-    """)
-    db.execute(log_query, {
-        "org_id": org_id,
-        "agent_id": agent_id,
-        "phone_id": phone_id,
-        "session_id": session_id,
-        "caller": caller_id
-    })
-    db.commit()
-    
-    # 5. Spawn Voice Agent Worker
-    # We use BackgroundTasks to start the agent AFTER the response is sent
-    # However, LiveKit expects the room to be ready or the agent to join.
-    # We'll start it in the background.
-    background_tasks.add_task(start_voice_agent, room_name, str(agent_id), db)
+    # 4. Hand the room to the least-loaded voice worker (run_voice_workers.py);
+    # audio never runs on the API's event loop. The worker loads the agent's
+    # workflow as soon as it takes the call, while LiveKit is still ringing.
+    try:
+        worker_id = await voice_dispatcher.dispatch(room_name, str(agent_id))
+    except NoVoiceWorkerAvailable as e:
+        print(f"❌ {e}")
+        raise HTTPException(status_code=503, detail="No voice worker available")
+    print(f"📤 Room {room_name} dispatched to worker {worker_id}")
+
+    # 5. Log Call Start (batched insert, off the response path)
+    call_log_writer.log_call(
+        org_id=org_id,
+        agent_id=agent_id,
+        phone_id=phone_id,
+        session_id=session_id,
+        caller=caller_id
+    )
 
     # 6. Return LiveKit Config
     participant_identity = f"sip-user-{caller_id}"
@@ -120,13 +87,14 @@ async def handle_sip_inbound(
 async def start_outbound_call(
     agent_id: str,
     phone_number: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Initiate an outbound call via SIP
     """
     # 1. Get Agent & Org
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    result = await db.execute(select(Agent).where(Agent.id == agent_id))
+    agent = result.scalars().first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -139,7 +107,7 @@ async def start_outbound_call(
     # 4. Trigger LiveKit SIP Egress/Outbound
     # await LiveKitService.create_sip_participant(...)
     
-    # 5. Spawn Voice Agent
-    # asyncio.create_task(start_voice_agent(room_name, agent_id, db))
+    # 5. Dispatch Voice Agent
+    # await voice_dispatcher.dispatch(room_name, str(agent.id))
 
     return {"status": "initiated", "room_name": room_name, "session_id": session_id}
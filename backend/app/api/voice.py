@@ -3,22 +3,39 @@ Voice API endpoints
 """
 
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from fastapi.responses import Response
-from sqlalchemy.orm import Session
-from ..database import get_db
+from fastapi.responses import Response, StreamingResponse
+from urllib.parse import quote
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import get_async_db, AsyncSessionLocal
 from ..langgraph.agent_runtime import runtime
+from ..langgraph.turn_queue import TurnQueueFull
+from ..voice.pipeline import speech_chunks, synthesize_chunks
 from ..voice.stt import speech_to_text
-from ..voice.tts import text_to_speech
 
 router = APIRouter()
 
 
+def _queue_full(message: str) -> HTTPException:
+    """429 for a session with too many queued turns"""
+    return HTTPException(
+        status_code=429,
+        detail=message,
+        headers={"Retry-After": str(settings.TURN_QUEUE_RETRY_AFTER_SECONDS)}
+    )
+
+
+def _header_text(text: str) -> str:
+    """Percent-encode a transcript for a header (latin-1 only, no CR/LF)"""
+    return quote(text, safe=" ")
+
+
 @router.post("/voice/{agent_id}/process")
 async def process_voice(
     agent_id: str,
     audio: UploadFile = File(...),
     session_id: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Process voice input and return voice response"""
     try:
@@ -26,35 +43,91 @@ async def process_voice(
         audio_bytes = await audio.read()
         
         # Get agent config
-        agent_data = await runtime.load_agent(agent_id, db)
+        agent_data = await runtime.load_agent(agent_id)
         config = agent_data["config"]
         
         # STT: Audio -> Text
-        user_text = await speech_to_text(audio_bytes, config)
+        user_text = await speech_to_text(
+            audio_bytes, config, mimetype=audio.content_type or "audio/webm"
+        )
         
-        # Execute agent
-        result = await runtime.execute_text(
+        # Execute agent; sentences are synthesized while the LLM streams
+        final = {}
+        events = runtime.execute_text_stream(
             agent_id=agent_id,
             user_input=user_text,
             session_id=session_id,
             db=db,
             metadata={"channel": "voice"}
         )
+        audio_chunks = []
+        async for _, chunk in synthesize_chunks(speech_chunks(events, final), config):
+            audio_chunks.append(chunk)
         
-        agent_response = result["response"]
+        agent_response = final["content"]
         
-        # TTS: Text -> Audio
-        audio_response = await text_to_speech(agent_response, config)
+        # MP3 segments concatenate into one playable stream
+        audio_response = b"".join(audio_chunks)
         
         # Return audio with transcripts in headers
         return Response(
             content=audio_response,
             media_type="audio/mpeg",
             headers={
-                "X-User-Transcript": user_text,
-                "X-Agent-Transcript": agent_response,
+                "X-User-Transcript": _header_text(user_text),
+                "X-Agent-Transcript": _header_text(agent_response),
             }
         )
     
+    except TurnQueueFull as e:
+        raise _queue_full(str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/voice/{agent_id}/process/stream")
+async def process_voice_stream(
+    agent_id: str,
+    audio: UploadFile = File(...),
+    session_id: str = Form(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Process voice input and stream the spoken response.
+
+    Audio starts with the first synthesized sentence; the agent transcript
+    is not known up front, so only the user transcript is sent as a header.
+    """
+    audio_bytes = await audio.read()
+    
+    try:
+        agent_data = await runtime.load_agent(agent_id)
+        config = agent_data["config"]
+        user_text = await speech_to_text(
+            audio_bytes, config, mimetype=audio.content_type or "audio/webm"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Once audio headers are sent a rejected turn can only cut the stream short
+    if runtime.turns.full(session_id):
+        raise _queue_full(f"Too many queued turns for session {session_id}")
+    
+    async def audio_stream():
+        # The request-scoped session may close before streaming finishes
+        async with AsyncSessionLocal() as stream_db:
+            events = runtime.execute_text_stream(
+                agent_id=agent_id,
+                user_input=user_text,
+                session_id=session_id,
+                db=stream_db,
+                metadata={"channel": "voice"}
+            )
+            async for _, chunk in synthesize_chunks(speech_chunks(events, {}), config):
+                yield chunk
+    
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/mpeg",
+        headers={"X-User-Transcript": _header_text(user_text)}
+    )
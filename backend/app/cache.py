@@ -0,0 +1,96 @@
+"""
+In-process caching primitives
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU cache with per-entry expiry and optional size accounting.
+
+    ``max_bytes`` bounds the summed ``sizeof(value)`` of all entries in
+    addition to ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a live value or None"""
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, size = item
+        if expires_at < time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Insert or replace a value, evicting least recently used entries"""
+        self.pop(key)
+        size = self.sizeof(value)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self.pop(oldest)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a key, returning its value if present"""
+        item = self._entries.pop(key, None)
+        if item is None:
+            return None
+        self.bytes -= item[2]
+        return item[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -22,17 +22,107 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str = ""
     GOOGLE_API_KEY: str = ""
     
+    # LLM concurrency (max in-flight calls per provider, per process)
+    OPENAI_MAX_CONCURRENCY: int = 64
+    ANTHROPIC_MAX_CONCURRENCY: int = 32
+    GOOGLE_MAX_CONCURRENCY: int = 32
+    
+    # LLM client pooling
+    LLM_CLIENT_CACHE_SIZE: int = 256
+    LLM_POOL_MAX_CONNECTIONS: int = 100
+    LLM_POOL_MAX_KEEPALIVE: int = 20
+    LLM_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_REQUEST_TIMEOUT: float = 60.0
+    
+    # Compiled agent cache (per worker)
+    AGENT_CACHE_MAX_SIZE: int = 1000
+    AGENT_CACHE_TTL_SECONDS: float = 60.0
+    AGENT_CACHE_MAX_STALE_SECONDS: float = 3600.0
+    AGENT_CACHE_STORE_ORM: bool = False
+    
+    # Conversation history loaded per turn
+    HISTORY_MAX_MESSAGES: int = 50
+    
+    # Turns waiting per session behind the one running
+    TURN_QUEUE_MAX_DEPTH: int = 4
+    # Retry-After sent when a session's turn queue is full
+    TURN_QUEUE_RETRY_AFTER_SECONDS: int = 2
+    
+    # Rolling history summaries
+    SUMMARY_LLM_MODEL: str = "gpt-4o-mini"
+    SUMMARY_MAX_TOKENS: int = 400
+    
+    # Response cache (per worker, shared by all agents)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+    
     # Voice APIs
     ELEVENLABS_API_KEY: str = ""
     DEEPGRAM_API_KEY: str = ""
+    # Whisper partial transcripts every this much new speech (0 = final only);
+    # each partial re-transcribes the utterance so far, one request at a time
+    STT_WHISPER_PARTIAL_INTERVAL_MS: int = 1000
+    # Sentences synthesized ahead of playback in the speech pipeline
+    TTS_PIPELINE_LOOKAHEAD: int = 2
+    # Synthesized audio cache (per worker memory tier, shared disk tier)
+    TTS_CACHE_DIR: str = "data/tts_cache"
+    TTS_CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    TTS_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+    TTS_CACHE_MAX_TEXT_CHARS: int = 200
+    # Voice activity detection (end silence scales with agent responsiveness)
+    VAD_PRE_ROLL_MS: int = 300
+    VAD_MIN_SPEECH_MS: int = 60
+    VAD_END_SILENCE_MS: int = 700
+    VAD_MAX_UTTERANCE_MS: int = 30000
+    VAD_ENERGY_RATIO: float = 3.0
+    VAD_MIN_RMS: float = 60.0
+    # Caller speech needed to interrupt the agent, divided by interruption_sensitivity
+    BARGE_IN_MIN_SPEECH_MS: int = 250
     
     # Vector DB
     PINECONE_API_KEY: str = ""
     PINECONE_ENVIRONMENT: str = ""
     
+    # Knowledge vector store: "pinecone", "local" or "auto" (Pinecone if keyed)
+    VECTOR_STORE_BACKEND: str = "auto"
+    LOCAL_VECTOR_DIR: str = "data/vectors"
+    LOCAL_VECTOR_QUANTIZE: bool = False
+    
+    # Knowledge ingestion
+    INGEST_CHUNK_SIZE: int = 1000
+    INGEST_CHUNK_OVERLAP: int = 150
+    INGEST_BATCH_SIZE: int = 512
+    INGEST_CONCURRENCY: int = 4
+    
+    # Knowledge retrieval caches (per worker)
+    KB_EMBEDDING_CACHE_SIZE: int = 10000
+    KB_EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    KB_EMBEDDING_CACHE_TTL_SECONDS: float = 86400.0
+    KB_RESULT_CACHE_SIZE: int = 5000
+    KB_RESULT_CACHE_TTL_SECONDS: float = 300.0
+    
+    # Query embedding micro-batching (0 window disables batching)
+    KB_EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    KB_EMBEDDING_BATCH_MAX_SIZE: int = 64
+    
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Voice worker pool (run_voice_workers.py; 0 workers = one per CPU core)
+    VOICE_WORKERS: int = 0
+    VOICE_WORKER_CAPACITY: int = 8
+    VOICE_WORKER_HEARTBEAT_SECONDS: float = 2.0
+    VOICE_WORKER_STALE_SECONDS: float = 10.0
+    VOICE_WORKER_DRAIN_TIMEOUT_SECONDS: float = 600.0
+    
+    # SIP inbound routing table and batched call log inserts
+    PHONE_ROUTING_TTL_SECONDS: float = 30.0
+    CALL_LOG_BATCH_SIZE: int = 100
+    CALL_LOG_FLUSH_INTERVAL_MS: float = 200.0
+    # Failed batches are retried with doubling backoff, then spilled to disk
+    CALL_LOG_WRITE_ATTEMPTS: int = 4
+    CALL_LOG_RETRY_BACKOFF_MS: float = 250.0
+    CALL_LOG_SPILL_DIR: str = "data/call_log_spill"
+    
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
@@ -41,6 +131,15 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
     
+    @property
+    def async_database_url(self) -> str:
+        """DATABASE_URL rewritten for the asyncpg driver"""
+        url = self.DATABASE_URL
+        for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+            if url.startswith(prefix):
+                return "postgresql+asyncpg://" + url[len(prefix):]
+        return url
+    
     @property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
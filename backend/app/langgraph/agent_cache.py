@@ -0,0 +1,97 @@
+"""
+Compiled agent cache
+Size- and TTL-bounded LRU cache for compiled agent workflows
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+class AgentCache:
+    """
+    LRU cache of compiled agents with a freshness TTL.
+
+    Entries older than ``ttl_seconds`` are still served (stale) so the caller
+    can revalidate them in the background; entries older than
+    ``max_stale_seconds`` are treated as misses.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, max_stale_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.refreshes = 0
+
+    def get(self, agent_id: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Return ``(entry, is_stale)``; entry is None on a miss"""
+        entry = self._entries.get(agent_id)
+        if entry is None:
+            self.misses += 1
+            return None, False
+
+        age = time.monotonic() - entry["loaded_at"]
+        if age > self.max_stale_seconds:
+            del self._entries[agent_id]
+            self.expirations += 1
+            self.misses += 1
+            return None, False
+
+        self._entries.move_to_end(agent_id)
+        if age > self.ttl_seconds:
+            self.stale_hits += 1
+            return entry, True
+
+        self.hits += 1
+        return entry, False
+
+    def peek(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        """Return an entry without touching recency or counters"""
+        return self._entries.get(agent_id)
+
+    def put(self, agent_id: str, entry: Dict[str, Any]):
+        """Insert or replace an entry, evicting the least recently used"""
+        entry["loaded_at"] = time.monotonic()
+        self._entries[agent_id] = entry
+        self._entries.move_to_end(agent_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, agent_id: str):
+        """Mark an entry fresh again after a successful revalidation"""
+        entry = self._entries.get(agent_id)
+        if entry is not None:
+            entry["loaded_at"] = time.monotonic()
+            self.refreshes += 1
+
+    def invalidate(self, agent_id: str):
+        """Drop an entry"""
+        self._entries.pop(agent_id, None)
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "refreshes": self.refreshes,
+        }
@@ -3,56 +3,282 @@ Agent runtime service
 Loads and executes agents
 """
 
-from typing import Dict, Optional, Any
+import asyncio
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Any
 from .workflow_builder import WorkflowBuilder
+from .agent_cache import AgentCache
+from .context_policy import context_policy, durable_context, select_history_window, summarize
+from .pii import response_redactor, storage_redactor
+from .turn_queue import SessionTurnQueue, Turn
 from ..models.agent import Agent as AgentModel
-from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import AsyncSessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 class AgentRuntime:
     """Runtime for executing LangGraph agents"""
     
     def __init__(self):
-        self.active_agents: Dict[str, Any] = {}
+        self.active_agents = AgentCache(
+            max_size=settings.AGENT_CACHE_MAX_SIZE,
+            ttl_seconds=settings.AGENT_CACHE_TTL_SECONDS,
+            max_stale_seconds=settings.AGENT_CACHE_MAX_STALE_SECONDS
+        )
+        self._revalidating: set = set()
+        # Bumped by invalidate_cache so in-flight refreshes can tell they are stale
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._summarizing: set = set()
+        # Background tasks; the loop only keeps weak references to tasks
+        self._background: set = set()
+        self.coalesced_loads = 0
+        self.turns = SessionTurnQueue(max_depth=settings.TURN_QUEUE_MAX_DEPTH)
     
-    async def load_agent(self, agent_id: str, db: Session):
+    async def load_agent(self, agent_id: str):
         """Load and compile agent workflow"""
-        # Check cache
-        if agent_id in self.active_agents:
-            return self.active_agents[agent_id]
-        
-        # Fetch from database
-        agent = db.query(AgentModel).filter(AgentModel.id == agent_id).first()
-        if not agent:
-            raise ValueError(f"Agent {agent_id} not found")
-        
-        # Build workflow
-        builder = WorkflowBuilder(agent.config_json)
-        workflow = builder.build()
-        
-        # Cache
-        self.active_agents[agent_id] = {
-            "workflow": workflow,
+        # Check cache; stale entries are served while they revalidate
+        entry, is_stale = self.active_agents.get(agent_id)
+        if entry is not None:
+            if is_stale:
+                self._schedule_revalidation(agent_id)
+            return entry
+        
+        # Single-flight: concurrent misses share one load task. It has its own
+        # session and is never cancelled because one of its callers went away.
+        task = self._loading.get(agent_id)
+        if task is None:
+            task = asyncio.create_task(self._load(agent_id, self._generations.get(agent_id, 0)))
+            self._loading[agent_id] = task
+            task.add_done_callback(lambda task: self._load_done(agent_id, task))
+        else:
+            self.coalesced_loads += 1
+        return await asyncio.shield(task)
+    
+    def _load_done(self, agent_id: str, task: asyncio.Task):
+        if self._loading.get(agent_id) is task:
+            del self._loading[agent_id]
+        # Mark retrieved so failures with no caller left don't log "never retrieved"
+        if not task.cancelled():
+            task.exception()
+    
+    async def _load(self, agent_id: str, generation: int) -> Dict[str, Any]:
+        """Fetch an agent row, compile its workflow and cache it"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(AgentModel).where(AgentModel.id == agent_id))
+            agent = result.scalars().first()
+            if not agent:
+                raise ValueError(f"Agent {agent_id} not found")
+            
+            # Graph compilation is CPU work; keep it off the event loop
+            entry = await asyncio.to_thread(self._compile, agent)
+        
+        # Skip caching if the agent was invalidated while loading
+        if self._generations.get(agent_id, 0) == generation:
+            self.active_agents.put(agent_id, entry)
+        return entry
+    
+    def _compile(self, agent: AgentModel) -> Dict[str, Any]:
+        """Build the cache entry for an agent row"""
+        builder = WorkflowBuilder(
+            agent.config_json,
+            cache_namespace=f"{agent.id}:{agent.version}"
+        )
+        entry = {
+            "workflow": builder.build(),
             "config": agent.config_json,
-            "agent": agent
+            "version": agent.version,
+            "updated_at": agent.updated_at
         }
         
-        return self.active_agents[agent_id]
+        # Holding the ORM row pins its identity map state; opt-in only
+        if settings.AGENT_CACHE_STORE_ORM:
+            entry["agent"] = agent
+        
+        return entry
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Agent cache counters including coalesced loads"""
+        stats = self.active_agents.stats()
+        stats["loads_in_flight"] = len(self._loading)
+        stats["coalesced_loads"] = self.coalesced_loads
+        stats["turns"] = self.turns.stats()
+        return stats
+    
+    def session_turn(self, session_id: str, user_input: str, coalesce: bool = False):
+        """
+        Hold a session's turn across more than one call (e.g. a spoken reply).
+        
+        Pass the yielded turn to ``execute_text``/``execute_text_stream`` as
+        ``turn``; a turn that was coalesced into a queued one must be skipped.
+        """
+        return self.turns.turn(session_id, user_input, coalesce)
+    
+    @asynccontextmanager
+    async def _hold_turn(self, session_id: str, user_input: str, turn: Optional[Turn]):
+        if turn is not None:
+            yield turn
+            return
+        async with self.turns.turn(session_id, user_input) as turn:
+            yield turn
+    
+    def _schedule_revalidation(self, agent_id: str):
+        """Refresh a stale entry in the background, once per agent"""
+        if agent_id in self._revalidating:
+            return
+        self._revalidating.add(agent_id)
+        self._spawn(self._revalidate(agent_id))
+    
+    def _spawn(self, coro):
+        """Run a coroutine in the background, holding its task until it is done"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+    
+    async def _revalidate(self, agent_id: str):
+        """Recompile a stale entry only if the agent changed"""
+        generation = self._generations.get(agent_id, 0)
+        # The triggering request's session may already be closed
+        db = AsyncSessionLocal()
+        try:
+            result = await db.execute(
+                select(AgentModel.version, AgentModel.updated_at).where(
+                    AgentModel.id == agent_id
+                )
+            )
+            row = result.first()
+            entry = self.active_agents.peek(agent_id)
+            
+            if not row:
+                self.active_agents.invalidate(agent_id)
+            elif self._generations.get(agent_id, 0) != generation:
+                # Invalidated meanwhile; the next request reloads it
+                pass
+            elif entry and (row.version, row.updated_at) == (entry["version"], entry["updated_at"]):
+                self.active_agents.touch(agent_id)
+            else:
+                result = await db.execute(select(AgentModel).where(AgentModel.id == agent_id))
+                agent = result.scalars().first()
+                compiled = await asyncio.to_thread(self._compile, agent)
+                # Drop the result if the agent was invalidated while compiling
+                if self._generations.get(agent_id, 0) == generation:
+                    self.active_agents.put(agent_id, compiled)
+                    self.active_agents.refreshes += 1
+        except Exception as e:
+            print(f"❌ Failed to revalidate agent {agent_id}: {e}")
+        finally:
+            await db.close()
+            self._revalidating.discard(agent_id)
     
     async def execute_text(
         self,
         agent_id: str,
         user_input: str,
         session_id: str,
-        db: Session,
-        metadata: Optional[Dict] = None
+        db: AsyncSession,
+        metadata: Optional[Dict] = None,
+        turn: Optional[Turn] = None
     ) -> Dict:
-        """Execute agent for text input with session management"""
+        """
+        Execute agent for text input with session management.
+        
+        Turns of one session run one at a time; pass ``turn`` if the caller
+        already holds it (see ``session_turn``).
+        """
+        async with self._hold_turn(session_id, user_input, turn) as turn:
+            user_input = turn.user_input
+            started_at = datetime.utcnow()
+            session, agent_data, initial_state, overflow = await self._prepare_turn(
+                agent_id, user_input, session_id, db, metadata
+            )
+            
+            # Execute workflow
+            result = await agent_data["workflow"].ainvoke(initial_state)
+            
+            return await self._finish_turn(
+                turn, session, agent_data, user_input, started_at, result, overflow, db
+            )
+    
+    async def execute_text_stream(
+        self,
+        agent_id: str,
+        user_input: str,
+        session_id: str,
+        db: AsyncSession,
+        metadata: Optional[Dict] = None,
+        turn: Optional[Turn] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Execute agent for text input, yielding events as they happen.
+        
+        Yields ``{"type": "token", "content": delta}`` for every LLM token
+        and finally ``{"type": "message", "content": ..., "metadata": ...}``
+        once the workflow has finished and the turn is persisted. Turns of
+        one session run one at a time (see ``execute_text``).
+        """
+        async with self._hold_turn(session_id, user_input, turn) as turn:
+            user_input = turn.user_input
+            started_at = datetime.utcnow()
+            session, agent_data, initial_state, overflow = await self._prepare_turn(
+                agent_id, user_input, session_id, db, metadata
+            )
+            workflow = agent_data["workflow"]
+            
+            # Raw tokens bypass generate_response, so redact them incrementally
+            redactor = response_redactor(agent_data["config"])
+            redaction = redactor.stream() if redactor else None
+            
+            result = None
+            async for event in workflow.astream_events(initial_state, version="v2"):
+                kind = event["event"]
+                
+                if kind == "on_chat_model_stream":
+                    if event.get("metadata", {}).get("langgraph_node") != "llm_reasoning":
+                        continue
+                    delta = event["data"]["chunk"].content
+                    if delta and redaction:
+                        delta = redaction.feed(delta)
+                    if delta:
+                        yield {"type": "token", "content": delta}
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # Root graph finished: output is the final state
+                    result = event["data"]["output"]
+            
+            if result is None:
+                raise RuntimeError(f"Agent {agent_id} produced no result")
+            
+            if redaction:
+                tail = redaction.flush()
+                if tail:
+                    yield {"type": "token", "content": tail}
+            
+            final = await self._finish_turn(
+                turn, session, agent_data, user_input, started_at, result, overflow, db
+            )
+            yield {
+                "type": "message",
+                "content": final["response"],
+                "metadata": final["metadata"]
+            }
+    
+    async def _prepare_turn(
+        self,
+        agent_id: str,
+        user_input: str,
+        session_id: str,
+        db: AsyncSession,
+        metadata: Optional[Dict]
+    ):
+        """Load session and workflow and build the initial graph state"""
         from ..services.session_service import SessionService
         from langchain_core.messages import HumanMessage, AIMessage
         
         # Get or create session
-        session = SessionService.get_or_create_session(
+        session = await SessionService.get_or_create_session(
             session_id=session_id,
             agent_id=agent_id,
             channel='text',
@@ -61,12 +287,29 @@ class AgentRuntime:
         )
         
         # Load agent workflow
-        agent_data = await self.load_agent(agent_id, db)
-        workflow = agent_data["workflow"]
+        agent_data = await self.load_agent(agent_id)
+        
+        # Fetch messages not yet folded into the rolling summary
+        summarized = session.summarized_message_count or 0
+        backlog = (session.message_count or 0) - summarized
+        history = await SessionService.get_recent_history(
+            session, db, limit=min(backlog, settings.HISTORY_MAX_MESSAGES)
+        )
+        
+        # Keep what fits the agent's history budget; the rest gets summarized
+        kept, overflow_messages = select_history_window(
+            history, context_policy(agent_data["config"])
+        )
+        overflow = {
+            "messages": overflow_messages,
+            "expected_count": summarized,
+            # Older than the fetched window; the summary task reads them itself
+            "unfetched": backlog - len(history),
+            "new_count": summarized + (backlog - len(history)) + len(overflow_messages)
+        }
         
-        # Rebuild conversation history from session
         messages = []
-        for msg in (session.conversation_history or []):
+        for msg in kept:
             if msg["role"] == "user":
                 messages.append(HumanMessage(content=msg["content"]))
             elif msg["role"] == "assistant":
@@ -77,43 +320,182 @@ class AgentRuntime:
             "messages": messages,
             "user_input": user_input,
             "agent_response": "",
-            "context": session.context_data or {},
+            "context": durable_context(session.context_data),
+            "turn_context": {},
+            "history_summary": session.history_summary or "",
             "metadata": metadata or {},
             "session_id": session_id,
             "channel": "text",
             "next_action": ""
         }
         
-        # Execute workflow
-        result = await workflow.ainvoke(initial_state)
+        return session, agent_data, initial_state, overflow
+    
+    async def _finish_turn(
+        self,
+        turn: Turn,
+        session,
+        agent_data: Dict[str, Any],
+        user_input: str,
+        started_at: datetime,
+        result: Dict,
+        overflow: Dict[str, Any],
+        db: AsyncSession
+    ) -> Dict:
+        """Persist the turn to the session and shape the response"""
+        from ..services.session_service import SessionService
         
-        # Save messages to session history
-        SessionService.add_message_to_history(
-            session=session,
-            role="user",
-            content=user_input,
-            db=db
-        )
-        SessionService.add_message_to_history(
+        # Persist durable context only, and only when it changed
+        context = durable_context(result["context"])
+        if context != (session.context_data or {}):
+            session.context_data = context
+        
+        # Keep PII out of stored history if the storage policy says so
+        user_content = user_input
+        assistant_content = result["agent_response"]
+        redactor = storage_redactor(agent_data["config"])
+        if redactor:
+            user_content = redactor.redact(user_content)
+            assistant_content = redactor.redact(assistant_content)
+        
+        # Append both messages in one insert and commit once
+        finished_at = datetime.utcnow()
+        await SessionService.add_messages(
             session=session,
-            role="assistant",
-            content=result["agent_response"],
+            messages=[
+                {
+                    "role": "user",
+                    "content": user_content,
+                    "created_at": started_at
+                },
+                {
+                    "role": "assistant",
+                    "content": assistant_content,
+                    "created_at": finished_at,
+                    "latency_ms": int((finished_at - started_at).total_seconds() * 1000),
+                    "model_used": agent_data["config"].get("llm_model")
+                }
+            ],
             db=db
         )
+        turn.persisted = True
         
-        # Update session context
-        session.context_data = result["context"]
-        db.commit()
+        # Fold overflowed history into the summary off the response path
+        if (
+            overflow["new_count"] > overflow["expected_count"]
+            and context_policy(agent_data["config"])["summary_enabled"]
+        ):
+            self._schedule_summary(session.id, session.history_summary or "", overflow)
         
         return {
             "response": result["agent_response"],
             "metadata": result["metadata"]
         }
     
+    async def record_interruption(
+        self,
+        agent_id: str,
+        user_input: str,
+        spoken: str,
+        session_id: str,
+        persisted: bool,
+        started_at: datetime,
+        db: AsyncSession,
+        metadata: Optional[Dict] = None
+    ):
+        """
+        Store what an interrupted voice turn actually said.
+        
+        If the turn was already persisted (``Turn.persisted``), its response
+        is cut back to ``spoken``; otherwise the user message, stamped
+        ``started_at``, and the spoken part are added.
+        """
+        from ..services.session_service import SessionService
+        
+        session = await SessionService.get_or_create_session(
+            session_id=session_id,
+            agent_id=agent_id,
+            channel='text',
+            db=db,
+            metadata=metadata
+        )
+        agent_data = await self.load_agent(agent_id)
+        redactor = storage_redactor(agent_data["config"])
+        if redactor:
+            user_input = redactor.redact(user_input)
+            spoken = redactor.redact(spoken)
+        
+        if persisted:
+            await SessionService.replace_last_message(session, "assistant", spoken, db)
+            return
+        
+        # History is ordered by created_at, so the reply must sort after the question
+        messages = [{"role": "user", "content": user_input, "created_at": started_at}]
+        if spoken:
+            messages.append({
+                "role": "assistant",
+                "content": spoken,
+                "created_at": max(datetime.utcnow(), started_at + timedelta(microseconds=1))
+            })
+        await SessionService.add_messages(session=session, messages=messages, db=db)
+    
+    def _schedule_summary(self, session_pk, previous_summary: str, overflow: Dict[str, Any]):
+        """Update a session's rolling summary in the background, once at a time"""
+        if session_pk in self._summarizing:
+            return
+        self._summarizing.add(session_pk)
+        self._spawn(self._update_summary(session_pk, previous_summary, overflow))
+    
+    async def _update_summary(self, session_pk, previous_summary: str, overflow: Dict[str, Any]):
+        """
+        Summarize overflowed messages and store the result.
+        
+        Messages older than the turn's fetched window are read and folded
+        first, in batches of HISTORY_MAX_MESSAGES; each batch is stored as
+        it completes, so a failure only leaves the rest for a later turn.
+        """
+        from ..services.session_service import SessionService
+        
+        try:
+            summary = previous_summary
+            count = overflow["expected_count"]
+            end = count + overflow["unfetched"]
+            while count < end or overflow["messages"]:
+                if count < end:
+                    async with AsyncSessionLocal() as db:
+                        messages = await SessionService.get_history_slice(
+                            session_pk, count, min(settings.HISTORY_MAX_MESSAGES, end - count), db
+                        )
+                    if not messages:
+                        return
+                else:
+                    messages = overflow["messages"]
+                    overflow = {**overflow, "messages": []}
+                
+                summary = await summarize(summary, messages)
+                async with AsyncSessionLocal() as db:
+                    applied = await SessionService.update_summary(
+                        session_pk,
+                        summary,
+                        expected_count=count,
+                        new_count=count + len(messages),
+                        db=db
+                    )
+                if not applied:
+                    # Another writer moved the summary on; leave the rest to it
+                    return
+                count += len(messages)
+        except Exception as e:
+            print(f"❌ Failed to update history summary for session {session_pk}: {e}")
+        finally:
+            self._summarizing.discard(session_pk)
+    
     def invalidate_cache(self, agent_id: str):
         """Invalidate cached agent"""
-        if agent_id in self.active_agents:
-            del self.active_agents[agent_id]
+        self.active_agents.invalidate(agent_id)
+        self._generations[agent_id] = self._generations.get(agent_id, 0) + 1
+        # Loads already in flight must not repopulate the cache
+        self._loading.pop(agent_id, None)
 
 
 # Global runtime instance
@@ -0,0 +1,92 @@
+"""
+Conversation context policy
+Keeps the history sent to the LLM within a per-agent token budget
+"""
+
+import copy
+from typing import Dict, Any, List, Optional, Tuple
+from .llm_registry import llm_registry, provider_for_model
+from ..config import settings
+
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an "
+    "AI assistant. Update the summary with the new messages below. Keep facts, "
+    "names, numbers, decisions and open questions; drop small talk. Reply with "
+    "the updated summary only, in at most {max_words} words."
+)
+
+# Per-turn keys older sessions may still carry in context_data
+EPHEMERAL_CONTEXT_KEYS = frozenset({"knowledge"})
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def context_policy(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve an agent's context policy with defaults"""
+    return {
+        "max_history_tokens": config.get("context_max_history_tokens", 2000),
+        "keep_last_turns": config.get("context_keep_last_turns", 4),
+        "summary_enabled": config.get("context_summary_enabled", True),
+    }
+
+
+def durable_context(context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Detached copy of session context without per-turn keys"""
+    return {
+        key: copy.deepcopy(value)
+        for key, value in (context or {}).items()
+        if key not in EPHEMERAL_CONTEXT_KEYS
+    }
+
+
+def select_history_window(
+    history: List[Dict],
+    policy: Dict[str, Any]
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split history (oldest first) into ``(kept, overflow)``.
+
+    The last ``keep_last_turns`` turns are always kept; older messages are
+    added newest-first while they fit ``max_history_tokens``. Everything older
+    than the first message that does not fit is overflow, to be summarized.
+    """
+    keep_last = policy["keep_last_turns"] * 2
+    budget = policy["max_history_tokens"]
+
+    used = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = estimate_tokens(history[i]["content"])
+        if len(history) - i > keep_last and used + cost > budget:
+            break
+        used += cost
+        start = i
+
+    return history[start:], history[:start]
+
+
+async def summarize(previous_summary: str, messages: List[Dict]) -> str:
+    """Fold messages into the running summary"""
+    from langchain_core.messages import SystemMessage, HumanMessage
+
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    prompt = (
+        f"Current summary:\n{previous_summary or '(empty)'}\n\n"
+        f"New messages:\n{transcript}"
+    )
+
+    model = settings.SUMMARY_LLM_MODEL
+    llm = llm_registry.get(model, 0.0, settings.SUMMARY_MAX_TOKENS)
+    async with llm_registry.limit(provider_for_model(model)):
+        response = await llm.ainvoke([
+            SystemMessage(content=SUMMARY_PROMPT.format(
+                max_words=settings.SUMMARY_MAX_TOKENS * 3 // 4
+            )),
+            HumanMessage(content=prompt)
+        ])
+
+    return response.content
@@ -0,0 +1,94 @@
+"""
+Embedding batcher
+Coalesces concurrent query embeddings into batched provider requests
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches single-text embedding requests across sessions.
+
+    Texts arriving within ``window_ms`` of the first pending one (or until
+    ``max_batch_size`` distinct texts are pending) are embedded with a single
+    ``embed_batch`` call and the vectors are fanned back out to the callers.
+    Identical texts in the same window share one slot.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]],
+        window_ms: float,
+        max_batch_size: int
+    ):
+        self.embed_batch = embed_batch
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.requests = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing the provider request with concurrent callers"""
+        self.requests += 1
+        if self.window_seconds <= 0:
+            self.batches += 1
+            self.batched_texts += 1
+            return (await self.embed_batch([text]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(text)
+        if future is None:
+            future = loop.create_future()
+            self._pending[text] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_seconds, self._flush)
+
+        # Shielded: a cancelled caller must not cancel a slot others share
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, asyncio.Future]):
+        texts = list(batch)
+        self.batches += 1
+        self.batched_texts += len(texts)
+        try:
+            vectors = await self.embed_batch(texts)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, vector in zip(texts, vectors):
+            future = batch[text]
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching counters"""
+        return {
+            "window_ms": self.window_seconds * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+        }
@@ -4,10 +4,17 @@ Handles vector search and document retrieval.
 """
 
 import os
+import hashlib
 from typing import List, Dict, Any, Optional
+import numpy as np
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, ServerlessSpec
+from ..cache import TTLCache
+from ..config import settings
+from .embedding_batcher import EmbeddingBatcher
+from .response_cache import normalize_query
+from .vector_stores import VectorStoreBackend, PineconeBackend, LocalVectorBackend
 
 # Initialize Pinecone
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
@@ -16,8 +23,45 @@ PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "webbot-agents")
 class KnowledgeBase:
     def __init__(self):
         self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        self.vector_store = None
-        self._init_pinecone()
+        self.backend: Optional[VectorStoreBackend] = None
+        
+        # Query embeddings keyed by normalized query text (float32 arrays)
+        self.embedding_cache = TTLCache(
+            max_entries=settings.KB_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.KB_EMBEDDING_CACHE_TTL_SECONDS,
+            max_bytes=settings.KB_EMBEDDING_CACHE_MAX_BYTES,
+            sizeof=lambda vector: vector.nbytes
+        )
+        # Top-k chunks keyed by (kb ids with generation, query hash, k)
+        self.result_cache = TTLCache(
+            max_entries=settings.KB_RESULT_CACHE_SIZE,
+            ttl_seconds=settings.KB_RESULT_CACHE_TTL_SECONDS
+        )
+        # Concurrent cache misses share one embeddings request
+        self.embedding_batcher = EmbeddingBatcher(
+            embed_batch=lambda texts: self.embeddings.aembed_documents(texts),
+            window_ms=settings.KB_EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=settings.KB_EMBEDDING_BATCH_MAX_SIZE
+        )
+        # Bumped on invalidation so older result keys become unreachable
+        self._kb_generations: Dict[str, int] = {}
+        
+        self._init_backend()
+
+    def _init_backend(self):
+        """Select the vector store backend (VECTOR_STORE_BACKEND)"""
+        backend = settings.VECTOR_STORE_BACKEND
+        if backend == "auto":
+            backend = "pinecone" if PINECONE_API_KEY else "local"
+
+        if backend == "local":
+            self.backend = LocalVectorBackend(
+                root=settings.LOCAL_VECTOR_DIR,
+                quantize=settings.LOCAL_VECTOR_QUANTIZE
+            )
+            print(f"✅ Knowledge Base (local index at {settings.LOCAL_VECTOR_DIR}) initialized.")
+        else:
+            self._init_pinecone()
 
     def _init_pinecone(self):
         """Initialize Pinecone connection"""
@@ -34,15 +78,16 @@ class KnowledgeBase:
                 print(f"⚠️ Index {PINECONE_INDEX_NAME} not found. Please create it.")
                 return
 
-            self.vector_store = PineconeVectorStore(
+            vector_store = PineconeVectorStore(
                 index_name=PINECONE_INDEX_NAME,
                 embedding=self.embeddings
             )
+            self.backend = PineconeBackend(vector_store, pc.Index(PINECONE_INDEX_NAME))
             print("✅ Knowledge Base (Pinecone) initialized.")
         except Exception as e:
             print(f"❌ Failed to initialize Pinecone: {e}")
 
-    def search(self, query: str, kb_ids: List[str], k: int = 3) -> List[str]:
+    async def search(self, query: str, kb_ids: List[str], k: int = 3) -> List[str]:
         """
         Search for relevant documents in the vector store.
         
@@ -54,30 +99,61 @@ class KnowledgeBase:
         Returns:
             List of text chunks
         """
-        if not self.vector_store:
+        if not self.backend:
             return []
 
         if not kb_ids:
             return []
 
+        query = normalize_query(query)
+        cache_key = self._result_key(query, kb_ids, k)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
         try:
-            # Filter by knowledge_base_id
-            # Assuming documents are stored with metadata={"kb_id": "..."}
-            # Pinecone filter syntax
-            filter_dict = {
-                "kb_id": {"$in": kb_ids}
-            }
-
-            results = self.vector_store.similarity_search(
-                query,
-                k=k,
-                filter=filter_dict
-            )
+            # Backends filter to chunks whose kb_id is in kb_ids
+            embedding = await self.embed_query(query)
+            chunks = await self.backend.search(embedding, kb_ids, k)
             
-            return [doc.page_content for doc in results]
+            self.result_cache.set(cache_key, tuple(chunks))
+            return chunks
         except Exception as e:
             print(f"❌ Knowledge search failed: {e}")
             return []
 
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the knowledge base embedding model (cached)"""
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            vector = np.asarray(
+                await self.embedding_batcher.embed(key), dtype=np.float32
+            )
+            self.embedding_cache.set(key, vector)
+        return vector.tolist()
+
+    def invalidate(self, kb_id: str):
+        """Drop cached results for a knowledge base after its content changed"""
+        self._kb_generations[kb_id] = self._kb_generations.get(kb_id, 0) + 1
+        if self.backend:
+            self.backend.reload(kb_id)
+
+    def _result_key(self, query: str, kb_ids: List[str], k: int):
+        scope = tuple(
+            (kb_id, self._kb_generations.get(kb_id, 0)) for kb_id in sorted(kb_ids)
+        )
+        query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        return scope, query_hash, k
+
+    def stats(self) -> Dict[str, Any]:
+        """Embedding and retrieval cache counters"""
+        return {
+            "vector_store": self.backend.stats() if self.backend else None,
+            "embeddings": self.embedding_cache.stats(),
+            "embedding_batches": self.embedding_batcher.stats(),
+            "results": self.result_cache.stats(),
+        }
+
 # Singleton instance
 kb_service = KnowledgeBase()
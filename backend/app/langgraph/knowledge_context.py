@@ -0,0 +1,100 @@
+"""
+Knowledge context assembly
+Selects retrieved chunks for the prompt within a per-agent token budget
+"""
+
+import re
+from typing import Dict, Any, FrozenSet, List
+from .context_policy import estimate_tokens
+
+
+_WORD = re.compile(r"\w+")
+
+# Chunks sharing this fraction of the smaller one's shingles are duplicates
+DUPLICATE_OVERLAP = 0.8
+
+
+def knowledge_policy(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve an agent's knowledge context policy with defaults"""
+    max_chunks = config.get("knowledge_max_chunks", 4)
+    return {
+        "max_tokens": config.get("knowledge_max_tokens", 1500),
+        "max_chunks": max_chunks,
+        "mmr_lambda": config.get("knowledge_mmr_lambda", 0.7),
+        # Over-fetch so dedupe and MMR have candidates to choose from
+        "fetch_k": max_chunks * 3,
+    }
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Hashed word n-grams of a text (single words for very short texts)"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset(hash(word) for word in words)
+    return frozenset(
+        hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)
+    )
+
+
+def overlap(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """Fraction of the smaller shingle set contained in the other"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def assemble_knowledge(
+    chunks: List[str],
+    recent_texts: List[str],
+    policy: Dict[str, Any]
+) -> List[str]:
+    """
+    Pick the chunks to inject, most relevant first.
+
+    ``chunks`` are ordered by retrieval relevance. Chunks that duplicate an
+    already selected chunk (including the overlap between neighbouring
+    ingestion chunks) or whose text already appears in ``recent_texts`` are
+    skipped. The rest are chosen by maximal marginal relevance, using rank as
+    relevance and shingle overlap as similarity, until ``max_chunks`` or the
+    ``max_tokens`` budget is reached.
+    """
+    if not chunks or policy["max_chunks"] <= 0 or policy["max_tokens"] <= 0:
+        return []
+
+    recent = frozenset().union(*(shingles(text) for text in recent_texts))
+
+    candidates = []
+    for rank, chunk in enumerate(chunks):
+        chunk_shingles = shingles(chunk)
+        if not chunk_shingles:
+            continue
+        if len(chunk_shingles & recent) >= DUPLICATE_OVERLAP * len(chunk_shingles):
+            continue
+        relevance = 1.0 - rank / len(chunks)
+        candidates.append((relevance, chunk, chunk_shingles, estimate_tokens(chunk)))
+
+    selected: List[tuple] = []
+    used_tokens = 0
+    mmr_lambda = policy["mmr_lambda"]
+    while candidates and len(selected) < policy["max_chunks"]:
+        best_index = None
+        best_score = float("-inf")
+        for index, (relevance, _, chunk_shingles, _) in enumerate(candidates):
+            similarity = max(
+                (overlap(chunk_shingles, chosen[2]) for chosen in selected),
+                default=0.0
+            )
+            score = mmr_lambda * relevance - (1.0 - mmr_lambda) * similarity
+            if score > best_score:
+                best_index, best_score = index, score
+
+        candidate = candidates.pop(best_index)
+        if any(overlap(candidate[2], chosen[2]) >= DUPLICATE_OVERLAP for chosen in selected):
+            continue
+        if used_tokens + candidate[3] > policy["max_tokens"]:
+            # A smaller, less relevant chunk may still fit
+            continue
+        selected.append(candidate)
+        used_tokens += candidate[3]
+
+    return [chunk for _, chunk, _, _ in selected]
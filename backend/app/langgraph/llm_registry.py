@@ -0,0 +1,193 @@
+"""
+LLM client registry
+Process-wide, reusable chat model clients with shared HTTP connection pools
+"""
+
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Tuple
+import httpx
+from langchain_openai import ChatOpenAI
+from langchain_anthropic import ChatAnthropic
+from langchain_google_genai import ChatGoogleGenerativeAI
+from ..config import settings
+
+
+def provider_for_model(model: str) -> str:
+    """Map a model name to its provider"""
+    if model.startswith("claude"):
+        return "anthropic"
+    if model.startswith("gemini"):
+        return "google"
+    return "openai"
+
+
+class LLMClientRegistry:
+    """
+    Caches chat model clients keyed by (provider, model, temperature, max_tokens).
+
+    OpenAI clients of the same provider share one HTTP connection pool, so
+    keep-alive connections and TLS sessions survive across turns and agents.
+    ChatAnthropic does not accept an httpx client; its SDK shares a cached
+    pool per (base_url, timeout), so every instance gets the same timeout.
+    ChatGoogleGenerativeAI builds its own client, which gets the pool limits.
+    """
+
+    def __init__(self, max_clients: int = 256):
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._http_clients: Dict[str, httpx.Client] = {}
+        self._http_async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model: str, temperature: float, max_tokens: int):
+        """Get (or create) the client for a model configuration"""
+        provider = provider_for_model(model)
+        key = (provider, model, temperature, max_tokens)
+
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            self.hits += 1
+            return client
+
+        self.misses += 1
+        client = self._create(provider, model, temperature, max_tokens)
+        self._clients[key] = client
+
+        # Evict least recently used; the shared HTTP pools stay open
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+            self.evictions += 1
+
+        return client
+
+    def semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Get the in-flight call limiter for a provider"""
+        if provider not in self._semaphores:
+            limits = {
+                "openai": settings.OPENAI_MAX_CONCURRENCY,
+                "anthropic": settings.ANTHROPIC_MAX_CONCURRENCY,
+                "google": settings.GOOGLE_MAX_CONCURRENCY,
+            }
+            self._semaphores[provider] = asyncio.Semaphore(limits[provider])
+        return self._semaphores[provider]
+
+    @asynccontextmanager
+    async def limit(self, provider: str):
+        """Hold one of the provider's call slots, counting waiting and in-flight calls"""
+        semaphore = self.semaphore(provider)
+        self._waiting[provider] = self._waiting.get(provider, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[provider] -= 1
+        self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+        try:
+            yield
+        finally:
+            self._in_flight[provider] -= 1
+            semaphore.release()
+
+    def _create(self, provider: str, model: str, temperature: float, max_tokens: int):
+        """Construct a chat model client bound to the provider's pool"""
+        if provider == "openai":
+            return ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                http_client=self._http_client(provider),
+                http_async_client=self._http_async_client(provider)
+            )
+        elif provider == "anthropic":
+            # No http_client parameter; the SDK caches one pool per
+            # (base_url, timeout), so a fixed timeout keeps them all on one
+            return ChatAnthropic(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                default_request_timeout=settings.LLM_REQUEST_TIMEOUT
+            )
+        else:
+            # The wrapper builds its own genai client; it only takes httpx kwargs
+            return ChatGoogleGenerativeAI(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                client_args={
+                    "limits": self._limits(),
+                    "timeout": settings.LLM_REQUEST_TIMEOUT,
+                }
+            )
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY
+        )
+
+    def _http_client(self, provider: str) -> httpx.Client:
+        if provider not in self._http_clients:
+            self._http_clients[provider] = httpx.Client(
+                limits=self._limits(),
+                timeout=settings.LLM_REQUEST_TIMEOUT
+            )
+        return self._http_clients[provider]
+
+    def _http_async_client(self, provider: str) -> httpx.AsyncClient:
+        if provider not in self._http_async_clients:
+            self._http_async_clients[provider] = httpx.AsyncClient(
+                limits=self._limits(),
+                timeout=settings.LLM_REQUEST_TIMEOUT
+            )
+        return self._http_async_clients[provider]
+
+    def stats(self) -> Dict[str, Any]:
+        """Registry counters and per-provider pool usage"""
+        clients_per_provider: Dict[str, int] = {}
+        for provider, *_ in self._clients:
+            clients_per_provider[provider] = clients_per_provider.get(provider, 0) + 1
+
+        pools = {}
+        for provider, client in self._http_async_clients.items():
+            # httpx does not expose the pool publicly; report it when reachable
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = getattr(pool, "connections", None)
+            pools[provider] = {
+                "open_connections": len(connections) if connections is not None else None,
+                "max_connections": settings.LLM_POOL_MAX_CONNECTIONS,
+                "max_keepalive_connections": settings.LLM_POOL_MAX_KEEPALIVE,
+            }
+
+        return {
+            "clients": len(self._clients),
+            "max_clients": self.max_clients,
+            "clients_per_provider": clients_per_provider,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pools": pools,
+            "calls_in_flight": dict(self._in_flight),
+            "calls_waiting": dict(self._waiting),
+        }
+
+    async def aclose(self):
+        """Close the shared HTTP pools"""
+        for client in self._http_async_clients.values():
+            await client.aclose()
+        for client in self._http_clients.values():
+            client.close()
+        self._http_async_clients.clear()
+        self._http_clients.clear()
+        self._clients.clear()
+
+
+# Global registry instance
+llm_registry = LLMClientRegistry(max_clients=settings.LLM_CLIENT_CACHE_SIZE)
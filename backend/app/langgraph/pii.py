@@ -0,0 +1,133 @@
+"""
+PII redaction
+Compiled-once redaction for full texts and streamed tokens
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+
+# type -> (pattern, replacement); earlier types win at the same position
+PII_PATTERNS: Dict[str, Tuple[str, str]] = {
+    "ssn": (r"\b\d{3}-\d{2}-\d{4}\b", "[SSN REDACTED]"),
+    "credit_card": (r"\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b", "[CARD REDACTED]"),
+    "phone_number": (r"\b\d{3}[-.]?\d{3}[-.]?\d{4}\b", "[PHONE REDACTED]"),
+    "email": (r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b", "[EMAIL REDACTED]"),
+}
+
+# Storage policies whose stored messages must not contain PII
+REDACTED_STORAGE_POLICIES = ("no-pii", "basic-attributes")
+
+# Characters held back while streaming; PII longer than this may leak
+STREAM_LOOKAHEAD = 96
+
+
+class PIIRedactor:
+    """One combined pattern over the configured PII types"""
+
+    def __init__(self, pii_types: Iterable[str]):
+        types = [pii_type for pii_type in PII_PATTERNS if pii_type in set(pii_types)]
+        self.pii_types = tuple(types)
+        self.pattern = re.compile("|".join(
+            f"(?P<{pii_type}>{PII_PATTERNS[pii_type][0]})" for pii_type in types
+        ))
+        self._replacements = {pii_type: PII_PATTERNS[pii_type][1] for pii_type in types}
+
+    def _replace(self, match: "re.Match") -> str:
+        return self._replacements[match.lastgroup]
+
+    def redact(self, text: str) -> str:
+        """Redact all configured PII in a complete text"""
+        if not text:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def stream(self, lookahead: int = STREAM_LOOKAHEAD) -> "RedactionStream":
+        """Start incremental redaction of a token stream"""
+        return RedactionStream(self, lookahead)
+
+
+class RedactionStream:
+    """
+    Incremental redaction with a bounded lookahead buffer.
+
+    ``feed`` returns the redacted text that is safe to emit: everything
+    except the last ``lookahead`` characters, and never part of a match that
+    could still grow. ``flush`` redacts and returns the remainder.
+    """
+
+    def __init__(self, redactor: PIIRedactor, lookahead: int):
+        self.redactor = redactor
+        self.lookahead = lookahead
+        self._buffer = ""
+        # Last emitted character, so word boundaries see their real context
+        self._previous = ""
+
+    def feed(self, delta: str) -> str:
+        self._buffer += delta
+        cut = len(self._buffer) - self.lookahead
+        if cut <= 0:
+            return ""
+        return self._emit(cut)
+
+    def flush(self) -> str:
+        if not self._buffer:
+            return ""
+        return self._emit(len(self._buffer))
+
+    def _emit(self, cut: int) -> str:
+        text = self._previous + self._buffer
+        offset = len(self._previous)
+        cut += offset
+
+        pieces = []
+        position = offset
+        for match in self.redactor.pattern.finditer(text, offset):
+            if match.start() >= cut:
+                break
+            if match.end() > cut:
+                # Hold back a match straddling the cut until it is complete
+                cut = match.start()
+                break
+            pieces.append(text[position:match.start()])
+            pieces.append(self.redactor._replace(match))
+            position = match.end()
+        pieces.append(text[position:cut])
+
+        if cut > offset:
+            self._previous = text[cut - 1]
+        self._buffer = text[cut:]
+        return "".join(pieces)
+
+
+@lru_cache(maxsize=256)
+def _get_redactor(pii_types: Tuple[str, ...]) -> PIIRedactor:
+    return PIIRedactor(pii_types)
+
+
+def get_redactor(pii_types: Iterable[str]) -> Optional[PIIRedactor]:
+    """Shared redactor for a set of PII types (None if none are known)"""
+    known = tuple(sorted(set(pii_types) & set(PII_PATTERNS)))
+    if not known:
+        return None
+    return _get_redactor(known)
+
+
+def response_redactor(config: Dict[str, Any]) -> Optional[PIIRedactor]:
+    """Redactor for agent output, if PII redaction is enabled"""
+    if not config.get("pii_redaction_enabled"):
+        return None
+    return get_redactor(config.get("pii_redaction_list") or [])
+
+
+def storage_redactor(config: Dict[str, Any]) -> Optional[PIIRedactor]:
+    """
+    Redactor for persisted messages under the agent's data storage policy.
+
+    Policies that exclude PII use the configured types, or all known types
+    when none are configured.
+    """
+    if config.get("data_storage_policy") not in REDACTED_STORAGE_POLICIES:
+        return None
+    return get_redactor(config.get("pii_redaction_list") or PII_PATTERNS)
@@ -0,0 +1,146 @@
+"""
+Response cache
+Reuses LLM answers for repeated questions per agent version
+"""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from ..config import settings
+
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def knowledge_fingerprint(chunks: List[str]) -> str:
+    """Stable hash of the retrieved knowledge a response was grounded on"""
+    digest = hashlib.sha1()
+    for chunk in sorted(chunks or []):
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier LRU cache of agent responses.
+
+    Entries are scoped by namespace (agent id + version) and knowledge
+    fingerprint. The exact tier matches the normalized input; the semantic
+    tier matches by cosine similarity of query embeddings within the scope.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._scopes: Dict[Tuple[str, str], set] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup_exact(self, namespace: str, kb_fp: str, query: str) -> Optional[str]:
+        """Return the cached response for an identical normalized input"""
+        key = (namespace, kb_fp, query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        self.exact_hits += 1
+        return entry["response"]
+
+    def lookup_similar(
+        self,
+        namespace: str,
+        kb_fp: str,
+        vector: np.ndarray,
+        threshold: float
+    ) -> Optional[Tuple[str, float]]:
+        """Return ``(response, score)`` of the most similar cached input"""
+        now = time.monotonic()
+        keys = []
+        for key in list(self._scopes.get((namespace, kb_fp), ())):
+            if self._entries[key]["expires_at"] < now:
+                self._remove(key)
+            elif self._entries[key]["vector"] is not None:
+                keys.append(key)
+
+        if not keys:
+            return None
+
+        matrix = np.stack([self._entries[key]["vector"] for key in keys])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+
+        key = keys[best]
+        self._entries.move_to_end(key)
+        self.semantic_hits += 1
+        return self._entries[key]["response"], float(scores[best])
+
+    def record_miss(self):
+        self.misses += 1
+
+    def store(
+        self,
+        namespace: str,
+        kb_fp: str,
+        query: str,
+        response: str,
+        vector: Optional[np.ndarray],
+        ttl_seconds: float
+    ):
+        """Cache a response; ``vector`` must be L2-normalized (or None)"""
+        key = (namespace, kb_fp, query)
+        self._entries[key] = {
+            "response": response,
+            "vector": vector,
+            "expires_at": time.monotonic() + ttl_seconds
+        }
+        self._entries.move_to_end(key)
+        self._scopes.setdefault((namespace, kb_fp), set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str, str]):
+        self._entries.pop(key, None)
+        scope = self._scopes.get(key[:2])
+        if scope is not None:
+            scope.discard(key)
+            if not scope:
+                del self._scopes[key[:2]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+
+# Global cache instance
+response_cache = ResponseCache(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
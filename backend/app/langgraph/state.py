@@ -17,12 +17,21 @@ class AgentState(TypedDict):
     user_input: str
     agent_response: str
     
-    # Context from knowledge base, tools, etc.
+    # Durable context, persisted to the session's context_data
     context: Dict[str, Any]
     
+    # Per-turn context (retrieved knowledge, etc.), never persisted
+    turn_context: Dict[str, Any]
+    
+    # Rolling summary of turns older than the history window
+    history_summary: str
+    
     # Metadata
     metadata: Dict[str, Any]
     
+    # Response cache lookup for this turn (key parts, query embedding)
+    response_cache: Dict[str, Any]
+    
     # Session info
     session_id: str
     channel: str  # 'text' or 'voice'
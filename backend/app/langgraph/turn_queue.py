@@ -0,0 +1,113 @@
+"""
+Session turn queue
+Serializes turns per session with bounded queues and coalescing of rapid inputs
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+
+class TurnQueueFull(RuntimeError):
+    """Raised when a session already has the maximum number of queued turns"""
+
+
+class Turn:
+    """
+    One turn of a session.
+
+    ``user_input`` may grow while the turn is queued if later inputs are
+    coalesced into it. A turn with ``coalesced`` set was merged into an
+    earlier queued turn and must not be executed. ``persisted`` is set once
+    the turn's messages are stored.
+    """
+
+    def __init__(self, user_input: str, coalesce: bool):
+        self.user_input = user_input
+        self.coalesce = coalesce
+        self.coalesced = False
+        self.persisted = False
+
+
+class _Session:
+    def __init__(self):
+        # asyncio.Lock wakes waiters in FIFO order
+        self.lock = asyncio.Lock()
+        self.waiting: List[Turn] = []
+
+
+class SessionTurnQueue:
+    """
+    Per-session turn actor.
+
+    Turns of one session run one at a time in arrival order, while different
+    sessions run fully in parallel. At most ``max_depth`` turns may wait per
+    session. Inputs marked ``coalesce`` (e.g. voice utterances) are appended
+    to a coalescable turn that is still waiting instead of queuing their own.
+    """
+
+    def __init__(self, max_depth: int):
+        self.max_depth = max(1, max_depth)
+        self._sessions: Dict[str, _Session] = {}
+        self.turns = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def turn(self, session_id: str, user_input: str, coalesce: bool = False) -> AsyncIterator[Turn]:
+        """Hold the session's turn for the duration of the block"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+
+        if coalesce and session.waiting and session.waiting[-1].coalesce:
+            target = session.waiting[-1]
+            target.user_input = f"{target.user_input} {user_input}"
+            self.coalesced += 1
+            turn = Turn(user_input, coalesce)
+            turn.coalesced = True
+            yield turn
+            return
+
+        if len(session.waiting) >= self.max_depth:
+            self.rejected += 1
+            raise TurnQueueFull(f"Too many queued turns for session {session_id}")
+
+        turn = Turn(user_input, coalesce)
+        session.waiting.append(turn)
+        acquired = False
+        try:
+            await session.lock.acquire()
+            acquired = True
+        finally:
+            session.waiting.remove(turn)
+            if not acquired:
+                self._discard(session_id, session)
+
+        self.turns += 1
+        try:
+            yield turn
+        finally:
+            session.lock.release()
+            self._discard(session_id, session)
+
+    def full(self, session_id: str) -> bool:
+        """Whether a new (non-coalesced) turn for the session would be rejected now"""
+        session = self._sessions.get(session_id)
+        return session is not None and len(session.waiting) >= self.max_depth
+
+    def _discard(self, session_id: str, session: _Session):
+        """Forget idle sessions"""
+        if not session.waiting and not session.lock.locked():
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue counters"""
+        return {
+            "active_sessions": len(self._sessions),
+            "queued_turns": sum(len(session.waiting) for session in self._sessions.values()),
+            "turns": self.turns,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "max_depth": self.max_depth,
+        }
@@ -0,0 +1,384 @@
+"""
+Vector store backends for knowledge retrieval
+Pinecone (remote) and an in-process NumPy index persisted to local disk
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+
+class VectorStoreBackend:
+    """Interface shared by knowledge retrieval backends"""
+
+    name = "base"
+
+    async def search(self, embedding: List[float], kb_ids: List[str], k: int) -> List[str]:
+        """Return the text of the top-k chunks across the given knowledge bases"""
+        raise NotImplementedError
+
+    async def upsert(
+        self,
+        kb_id: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Insert or replace chunks of a knowledge base"""
+        raise NotImplementedError
+
+    async def existing_ids(self, kb_id: str, ids: List[str]) -> set:
+        """Return which of ``ids`` are already stored for a knowledge base"""
+        raise NotImplementedError
+
+    async def delete_stale(self, kb_id: str, sources: set, keep_ids: set) -> int:
+        """Delete chunks whose metadata source is in ``sources`` but id is not in ``keep_ids``"""
+        raise NotImplementedError
+
+    def reload(self, kb_id: str):
+        """Forget any in-process state for a knowledge base changed elsewhere"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class PineconeBackend(VectorStoreBackend):
+    """Pinecone index; chunks carry metadata={"kb_id": ..., "text": ...}"""
+
+    name = "pinecone"
+
+    # Pinecone caps request size; upserts are split into requests of this many
+    UPSERT_REQUEST_SIZE = 100
+    # Largest top_k a query accepts, and most ids per delete request
+    QUERY_LIMIT = 10000
+    DELETE_REQUEST_SIZE = 1000
+
+    def __init__(self, vector_store, index):
+        self.vector_store = vector_store
+        self.index = index
+
+    async def search(self, embedding: List[float], kb_ids: List[str], k: int) -> List[str]:
+        results = await self.vector_store.asimilarity_search_by_vector(
+            embedding,
+            k=k,
+            filter={"kb_id": {"$in": kb_ids}}
+        )
+        return [doc.page_content for doc in results]
+
+    async def upsert(
+        self,
+        kb_id: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        metadatas = metadatas or [{} for _ in ids]
+        vectors = [
+            {
+                "id": chunk_id,
+                "values": list(embedding),
+                "metadata": {**metadata, "kb_id": kb_id, "text": text},
+            }
+            for chunk_id, embedding, text, metadata in zip(ids, embeddings, texts, metadatas)
+        ]
+        # The Pinecone client is synchronous
+        for start in range(0, len(vectors), self.UPSERT_REQUEST_SIZE):
+            await asyncio.to_thread(
+                self.index.upsert,
+                vectors=vectors[start:start + self.UPSERT_REQUEST_SIZE]
+            )
+
+    async def existing_ids(self, kb_id: str, ids: List[str]) -> set:
+        response = await asyncio.to_thread(self.index.fetch, ids=list(ids))
+        return set(response.vectors.keys())
+
+    async def delete_stale(self, kb_id: str, sources: set, keep_ids: set) -> int:
+        # Metadata filters cannot exclude ids, so list each source's chunks by
+        # querying around a kept chunk; sources past QUERY_LIMIT chunks may
+        # keep some stale ones until the next run
+        if not keep_ids:
+            return 0
+        probe = next(iter(keep_ids))
+        deleted = 0
+        for source in sources:
+            while True:
+                response = await asyncio.to_thread(
+                    self.index.query,
+                    id=probe,
+                    top_k=self.QUERY_LIMIT,
+                    filter={"kb_id": {"$eq": kb_id}, "source": {"$eq": source}},
+                    include_values=False
+                )
+                stale = [match.id for match in response.matches if match.id not in keep_ids]
+                for start in range(0, len(stale), self.DELETE_REQUEST_SIZE):
+                    await asyncio.to_thread(
+                        self.index.delete,
+                        ids=stale[start:start + self.DELETE_REQUEST_SIZE]
+                    )
+                deleted += len(stale)
+                if not stale or len(response.matches) < self.QUERY_LIMIT:
+                    break
+        return deleted
+
+
+class _Segment:
+    """One immutable batch of vectors on disk plus its live-row mask"""
+
+    def __init__(self, path: str, vectors: np.ndarray, scales: Optional[np.ndarray],
+                 ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], live: np.ndarray):
+        self.path = path
+        self.vectors = vectors
+        self.scales = scales
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.live = live
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        scores = self.vectors @ query
+        if self.scales is not None:
+            scores = scores * self.scales
+        return np.where(self.live, scores, -np.inf)
+
+
+class LocalVectorBackend(VectorStoreBackend):
+    """
+    In-process cosine index, one directory per kb_id.
+
+    Each upsert writes a new segment (``seg-N.npy`` + ``seg-N.json`` holding
+    ids, texts and metadata) that is memory-mapped on load; replaced ids are
+    masked out of older segments via ``seg-N.live.npy``. Vectors are
+    L2-normalized and optionally stored as int8 with a per-row scale.
+    """
+
+    name = "local"
+
+    # Below this many rows scoring inline is cheaper than a thread hop
+    INLINE_SEARCH_ROWS = 500
+
+    def __init__(self, root: str, quantize: bool = False):
+        self.root = root
+        self.quantize = quantize
+        self._kbs: Dict[str, List[_Segment]] = {}
+        self._locations: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # Reentrant: _upsert holds it while calling _load
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    async def search(self, embedding: List[float], kb_ids: List[str], k: int) -> List[str]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        segments = [segment for kb_id in kb_ids for segment in await self._segments(kb_id)]
+        rows = sum(len(segment.ids) for segment in segments)
+        if rows == 0:
+            return []
+        if rows <= self.INLINE_SEARCH_ROWS:
+            return self._search(segments, query, k)
+        return await asyncio.to_thread(self._search, segments, query, k)
+
+    def _search(self, segments: List[_Segment], query: np.ndarray, k: int) -> List[str]:
+        candidates = []
+        for segment in segments:
+            scores = segment.scores(query)
+            top = min(k, len(scores))
+            for row in np.argpartition(-scores, top - 1)[:top]:
+                if np.isfinite(scores[row]):
+                    candidates.append((float(scores[row]), segment.texts[row]))
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return [text for _, text in candidates[:k]]
+
+    async def upsert(
+        self,
+        kb_id: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        if not ids:
+            return
+        metadatas = metadatas or [{} for _ in ids]
+        await asyncio.to_thread(self._upsert, kb_id, ids, embeddings, texts, metadatas)
+
+    async def existing_ids(self, kb_id: str, ids: List[str]) -> set:
+        await self._segments(kb_id)
+        locations = self._locations.get(kb_id, {})
+        return {chunk_id for chunk_id in ids if chunk_id in locations}
+
+    async def delete_stale(self, kb_id: str, sources: set, keep_ids: set) -> int:
+        await self._segments(kb_id)
+        return await asyncio.to_thread(self._delete_stale, kb_id, sources, keep_ids)
+
+    async def _segments(self, kb_id: str) -> List[_Segment]:
+        """Segments of a knowledge base, read from disk off the event loop on first use"""
+        segments = self._kbs.get(kb_id)
+        if segments is not None:
+            return segments
+        return await asyncio.to_thread(self._load, kb_id)
+
+    def _upsert(self, kb_id: str, ids: List[str], embeddings, texts: List[str],
+                metadatas: List[Dict[str, Any]]):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            segments = self._load(kb_id)
+            locations = self._locations[kb_id]
+            kb_dir = self._kb_dir(kb_id)
+            os.makedirs(kb_dir, exist_ok=True)
+
+            # Mask rows being replaced in older segments
+            touched = set()
+            for chunk_id in ids:
+                if chunk_id in locations:
+                    seg_index, row = locations[chunk_id]
+                    segments[seg_index].live[row] = False
+                    touched.add(seg_index)
+            for seg_index in touched:
+                self._atomic_save(segments[seg_index].path + ".live.npy", segments[seg_index].live)
+
+            seg_index = len(segments)
+            path = os.path.join(kb_dir, f"seg-{seg_index:06d}")
+            if self.quantize:
+                scales = np.abs(matrix).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                stored = np.round(matrix / scales[:, None]).astype(np.int8)
+                self._atomic_save(path + ".scales.npy", scales.astype(np.float32))
+            else:
+                scales = None
+                stored = matrix
+            self._atomic_save(path + ".npy", stored)
+            live = np.ones(len(ids), dtype=bool)
+            self._atomic_save(path + ".live.npy", live)
+            # The JSON file is written last and marks the segment complete
+            self._atomic_write_json(path + ".json", {
+                "ids": list(ids),
+                "texts": list(texts),
+                "metadatas": list(metadatas),
+            })
+
+            segments.append(_Segment(
+                path,
+                np.load(path + ".npy", mmap_mode="r"),
+                scales,
+                list(ids),
+                list(texts),
+                list(metadatas),
+                live
+            ))
+            for row, chunk_id in enumerate(ids):
+                locations[chunk_id] = (seg_index, row)
+
+    def _delete_stale(self, kb_id: str, sources: set, keep_ids: set) -> int:
+        with self._lock:
+            segments = self._load(kb_id)
+            locations = self._locations[kb_id]
+            deleted = 0
+            for segment in segments:
+                changed = False
+                for row, chunk_id in enumerate(segment.ids):
+                    if (
+                        segment.live[row]
+                        and chunk_id not in keep_ids
+                        and segment.metadatas[row].get("source") in sources
+                    ):
+                        segment.live[row] = False
+                        locations.pop(chunk_id, None)
+                        changed = True
+                        deleted += 1
+                if changed:
+                    self._atomic_save(segment.path + ".live.npy", segment.live)
+            return deleted
+
+    def _load(self, kb_id: str) -> List[_Segment]:
+        """Memory-map a knowledge base's segments on first use"""
+        segments = self._kbs.get(kb_id)
+        if segments is not None:
+            return segments
+
+        with self._lock:
+            if kb_id not in self._kbs:
+                self._read_segments(kb_id)
+            return self._kbs[kb_id]
+
+    def _read_segments(self, kb_id: str):
+        segments = []
+        locations: Dict[str, Tuple[int, int]] = {}
+        kb_dir = self._kb_dir(kb_id)
+        if os.path.isdir(kb_dir):
+            names = sorted(
+                name[:-len(".json")] for name in os.listdir(kb_dir)
+                if name.startswith("seg-") and name.endswith(".json")
+            )
+            for name in names:
+                path = os.path.join(kb_dir, name)
+                with open(path + ".json") as f:
+                    payload = json.load(f)
+                scales = (
+                    np.load(path + ".scales.npy")
+                    if os.path.exists(path + ".scales.npy") else None
+                )
+                segment = _Segment(
+                    path,
+                    np.load(path + ".npy", mmap_mode="r"),
+                    scales,
+                    payload["ids"],
+                    payload["texts"],
+                    # Segments written before metadata was stored have none
+                    payload.get("metadatas") or [{} for _ in payload["ids"]],
+                    np.load(path + ".live.npy")
+                )
+                for row, chunk_id in enumerate(segment.ids):
+                    if segment.live[row]:
+                        locations[chunk_id] = (len(segments), row)
+                segments.append(segment)
+
+        self._locations[kb_id] = locations
+        self._kbs[kb_id] = segments
+
+    def reload(self, kb_id: str):
+        # Segments written by another process (e.g. ingest_kb.py) appear on next load
+        with self._lock:
+            self._kbs.pop(kb_id, None)
+            self._locations.pop(kb_id, None)
+
+    def _kb_dir(self, kb_id: str) -> str:
+        if not kb_id or "/" in kb_id or "\\" in kb_id or kb_id.startswith("."):
+            raise ValueError(f"Invalid knowledge base id: {kb_id!r}")
+        return os.path.join(self.root, kb_id)
+
+    @staticmethod
+    def _atomic_save(path: str, array: np.ndarray):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _atomic_write_json(path: str, payload: Dict[str, Any]):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, Any]:
+        loaded = {
+            kb_id: {
+                "segments": len(segments),
+                "live_chunks": len(self._locations.get(kb_id, {})),
+            }
+            for kb_id, segments in self._kbs.items()
+        }
+        return {
+            "backend": self.name,
+            "root": self.root,
+            "quantize": self.quantize,
+            "loaded_knowledge_bases": loaded,
+        }
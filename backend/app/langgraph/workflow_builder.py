@@ -4,22 +4,32 @@ Converts agent configuration into executable workflows
 """
 
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import numpy as np
 from .state import AgentState
 from .knowledge import kb_service
+from .knowledge_context import knowledge_policy, assemble_knowledge
+from .pii import response_redactor
+from .llm_registry import llm_registry, provider_for_model
+from .response_cache import response_cache, normalize_query, knowledge_fingerprint
 
 
 class WorkflowBuilder:
     """Builds LangGraph workflows from agent configs"""
     
-    def __init__(self, agent_config: Dict[str, Any]):
+    def __init__(self, agent_config: Dict[str, Any], cache_namespace: Optional[str] = None):
         self.config = agent_config
+        # Scope for cached responses, e.g. "<agent id>:<version>"
+        self.cache_namespace = cache_namespace
+        # Compiled once per agent config; None when redaction is off
+        self.redactor = response_redactor(agent_config)
         self.graph = StateGraph(AgentState)
     
+    @property
+    def cache_enabled(self) -> bool:
+        return bool(self.config.get("response_cache_enabled") and self.cache_namespace)
+    
     def build(self):
         """Build complete workflow"""
         # Add nodes
@@ -29,48 +39,116 @@ class WorkflowBuilder:
         if self.config.get("knowledge_base_ids"):
             self.graph.add_node("retrieve_knowledge", self.retrieve_knowledge)
         
+        # Conditional: Add response cache lookup if enabled
+        if self.cache_enabled:
+            self.graph.add_node("check_cache", self.check_cache)
+        
         self.graph.add_node("llm_reasoning", self.llm_reasoning)
         self.graph.add_node("generate_response", self.generate_response)
         
         # Define edges
         self.graph.set_entry_point("process_input")
         
+        before_llm = "check_cache" if self.cache_enabled else "llm_reasoning"
         if self.config.get("knowledge_base_ids"):
             self.graph.add_edge("process_input", "retrieve_knowledge")
-            self.graph.add_edge("retrieve_knowledge", "llm_reasoning")
+            self.graph.add_edge("retrieve_knowledge", before_llm)
         else:
-            self.graph.add_edge("process_input", "llm_reasoning")
+            self.graph.add_edge("process_input", before_llm)
+        
+        # Cache hits skip the LLM entirely
+        if self.cache_enabled:
+            self.graph.add_conditional_edges(
+                "check_cache",
+                self._route_after_cache,
+                {"hit": "generate_response", "miss": "llm_reasoning"}
+            )
         
         self.graph.add_edge("llm_reasoning", "generate_response")
         self.graph.add_edge("generate_response", END)
         
         return self.graph.compile()
     
-    def process_input(self, state: AgentState) -> AgentState:
+    # Nodes return only the keys they update; "messages" updates are appended
+    
+    async def process_input(self, state: AgentState) -> Dict[str, Any]:
         """Process and normalize user input"""
         user_input = state["user_input"]
         
-        # Add user message to history
-        state["messages"].append(HumanMessage(content=user_input))
+        # Optionally keep the user's PII from reaching the LLM
+        if self.redactor and self.config.get("pii_redact_user_input"):
+            user_input = self.redactor.redact(user_input)
         
-        return state
+        # Add user message to history
+        return {
+            "user_input": user_input,
+            "messages": [HumanMessage(content=user_input)]
+        }
     
-    def retrieve_knowledge(self, state: AgentState) -> AgentState:
+    async def retrieve_knowledge(self, state: AgentState) -> Dict[str, Any]:
         """Retrieve relevant knowledge from KBs"""
         user_input = state["messages"][-1].content
         kb_ids = self.config.get("knowledge_base_ids", [])
+        turn_context = dict(state.get("turn_context") or {})
         
         if kb_ids:
             print(f"🔍 Searching Knowledge Base for: {user_input}")
-            chunks = kb_service.search(user_input, kb_ids)
-            state["context"]["knowledge"] = chunks
-            print(f"📚 Found {len(chunks)} relevant chunks")
+            policy = knowledge_policy(self.config)
+            chunks = await kb_service.search(user_input, kb_ids, k=policy["fetch_k"])
+            
+            # Dedupe, diversify and cap to the knowledge token budget,
+            # skipping text the recent turns already carry
+            recent_texts = [message.content for message in state["messages"][:-1]]
+            selected = assemble_knowledge(chunks, recent_texts, policy)
+            turn_context["knowledge"] = selected
+            print(f"📚 Found {len(chunks)} relevant chunks, using {len(selected)}")
         else:
-            state["context"]["knowledge"] = []
+            turn_context["knowledge"] = []
             
-        return state
+        return {"turn_context": turn_context}
+    
+    async def check_cache(self, state: AgentState) -> Dict[str, Any]:
+        """Look up a cached response for this input"""
+        query = normalize_query(state["user_input"])
+        knowledge = (state.get("turn_context") or {}).get("knowledge", [])
+        kb_fp = knowledge_fingerprint(knowledge)
+        lookup = {"query": query, "kb_fp": kb_fp, "vector": None}
+        update = {
+            "response_cache": lookup,
+            "metadata": {**state["metadata"]}
+        }
+        
+        cached = response_cache.lookup_exact(self.cache_namespace, kb_fp, query)
+        cache_meta = {"hit": cached is not None, "tier": "exact" if cached else None}
+        
+        threshold = self.config.get("response_cache_similarity_threshold", 0.95)
+        if cached is None and threshold < 1.0:
+            try:
+                vector = np.asarray(await kb_service.embed_query(query), dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+                lookup["vector"] = vector
+                match = response_cache.lookup_similar(
+                    self.cache_namespace, kb_fp, vector, threshold
+                )
+                if match:
+                    cached, score = match
+                    cache_meta = {"hit": True, "tier": "semantic", "score": score}
+            except Exception as e:
+                print(f"⚠️ Semantic cache lookup failed: {e}")
+        
+        if cached is None:
+            response_cache.record_miss()
+        else:
+            update["agent_response"] = cached
+            update["messages"] = [AIMessage(content=cached)]
+        
+        update["metadata"]["cache"] = cache_meta
+        return update
+    
+    def _route_after_cache(self, state: AgentState) -> str:
+        return "hit" if state["metadata"]["cache"]["hit"] else "miss"
     
-    def llm_reasoning(self, state: AgentState) -> AgentState:
+    async def llm_reasoning(self, state: AgentState) -> Dict[str, Any]:
         """Main LLM reasoning"""
         # Get LLM instance
         llm = self._get_llm()
@@ -78,10 +156,15 @@ class WorkflowBuilder:
         # Build messages
         system_prompt = self.config["system_prompt"]
         
+        # Add summary of turns that fell out of the history window
+        if state.get("history_summary"):
+            system_prompt += f"\n\nSummary of earlier conversation:\n{state['history_summary']}"
+        
         # Add knowledge context if available
-        if state["context"].get("knowledge"):
+        knowledge = (state.get("turn_context") or {}).get("knowledge")
+        if knowledge:
             knowledge_text = "\n".join([
-                f"- {chunk}" for chunk in state["context"]["knowledge"]
+                f"- {chunk}" for chunk in knowledge
             ])
             system_prompt += f"\n\nRelevant Knowledge:\n{knowledge_text}"
         
@@ -90,81 +173,46 @@ class WorkflowBuilder:
             *state["messages"]
         ]
         
-        # Call LLM
-        response = llm.invoke(messages)
-        state["agent_response"] = response.content
-        state["messages"].append(AIMessage(content=response.content))
+        # Call LLM, bounded per provider
+        provider = provider_for_model(self.config["llm_model"])
+        async with llm_registry.limit(provider):
+            response = await llm.ainvoke(messages)
+        
+        # Remember the answer for repeated questions
+        lookup = state.get("response_cache")
+        if self.cache_enabled and lookup:
+            response_cache.store(
+                self.cache_namespace,
+                lookup["kb_fp"],
+                lookup["query"],
+                response.content,
+                lookup["vector"],
+                ttl_seconds=self.config.get("response_cache_ttl_seconds", 3600)
+            )
         
-        return state
+        return {
+            "agent_response": response.content,
+            "messages": [AIMessage(content=response.content)]
+        }
     
-    def generate_response(self, state: AgentState) -> AgentState:
+    async def generate_response(self, state: AgentState) -> Dict[str, Any]:
         """Generate final response with post-processing"""
         response = state["agent_response"]
         
         # Apply PII redaction if enabled
-        if self.config.get("pii_redaction_enabled"):
-            response = self._redact_pii(response)
-            state["agent_response"] = response
+        if self.redactor:
+            response = self.redactor.redact(response)
         
-        return state
+        return {"agent_response": response}
     
     def _get_llm(self):
-        """Get configured LLM instance"""
+        """Get configured LLM instance from the shared client registry"""
         model = self.config["llm_model"]
         temperature = self.config.get("temperature", 0.7)
         max_tokens = self.config.get("max_tokens", 1000)
         
-        if model.startswith("gpt"):
-            return ChatOpenAI(
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-        elif model.startswith("claude"):
-            return ChatAnthropic(
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-        elif model.startswith("gemini"):
-            return ChatGoogleGenerativeAI(
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-        else:
+        if not model.startswith(("gpt", "claude", "gemini")):
             # Default to GPT-4o-mini
-            return ChatOpenAI(
-                model="gpt-4o-mini",
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-    
-    def _redact_pii(self, text: str) -> str:
-        """Redact PII from text"""
-        import re
-        
-        pii_types = self.config.get("pii_redaction_list", [])
-        
-        if "ssn" in pii_types:
-            text = re.sub(r'\b\d{3}-\d{2}-\d{4}\b', '[SSN REDACTED]', text)
-        if "credit_card" in pii_types:
-            text = re.sub(
-                r'\b\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}\b',
-                '[CARD REDACTED]',
-                text
-            )
-        if "phone_number" in pii_types:
-            text = re.sub(
-                r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
-                '[PHONE REDACTED]',
-                text
-            )
-        if "email" in pii_types:
-            text = re.sub(
-                r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-                '[EMAIL REDACTED]',
-                text
-            )
+            model = "gpt-4o-mini"
         
-        return text
+        return llm_registry.get(model, temperature, max_tokens)
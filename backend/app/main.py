@@ -5,11 +5,20 @@ FastAPI application entry point
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .api import agents, chat
+from .database import async_engine
+from .api import agents, chat, knowledge
+from .langgraph.llm_registry import llm_registry
+from .langgraph.agent_runtime import runtime
+from .langgraph.response_cache import response_cache
+from .langgraph.knowledge import kb_service
+from .services.call_log_writer import call_log_writer
+from .services.phone_routing import phone_routing
+from .workers.dispatch import voice_dispatcher
 
 # Try to import voice features (optional)
 try:
     from .api import voice
+    from .voice.tts_cache import tts_cache
     VOICE_AVAILABLE = True
 except Exception as e:
     print(f"⚠️  Voice features disabled: {e}")
@@ -35,8 +44,10 @@ app.add_middleware(
 # Include routers
 app.include_router(agents.router, prefix="/api", tags=["agents"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(knowledge.router, prefix="/api", tags=["knowledge"])
 
 # Include voice router if available
+if VOICE_AVAILABLE:
     app.include_router(voice.router, prefix="/api", tags=["voice"])
     print("✅ Voice features enabled")
 else:
@@ -63,6 +74,41 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/stats")
+async def stats():
+    """Runtime cache and connection pool statistics"""
+    return {
+        "llm_clients": llm_registry.stats(),
+        "agent_cache": runtime.cache_stats(),
+        "response_cache": response_cache.stats(),
+        "knowledge": kb_service.stats(),
+        "tts_cache": tts_cache.stats() if VOICE_AVAILABLE else None,
+        "phone_routing": phone_routing.stats(),
+        "call_logs": call_log_writer.stats()
+    }
+
+
+@app.on_event("startup")
+async def startup():
+    """Load the SIP routing table before the first call"""
+    try:
+        await phone_routing.load()
+        print(f"✅ Phone routing table loaded ({phone_routing.stats()['numbers']} numbers)")
+    except Exception as e:
+        print(f"⚠️ Phone routing table not loaded, retrying on first call: {e}")
+    await phone_routing.listen()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release shared connection pools"""
+    await call_log_writer.aclose()
+    await phone_routing.aclose()
+    await llm_registry.aclose()
+    await voice_dispatcher.aclose()
+    await async_engine.dispose()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -2,7 +2,7 @@
 Session database models
 """
 
-from sqlalchemy import Column, String, Integer, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, JSON, DateTime, ForeignKey, Index, Text
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -27,9 +27,13 @@ class AgentSession(Base):
     
     # Conversation state
     message_count = Column(Integer, default=0)
-    conversation_history = Column(JSON, default=list)
+    conversation_history = Column(JSON, default=list)  # Legacy; history lives in agent_messages
     context_data = Column(JSON, default=dict)
     
+    # Rolling summary of the oldest summarized_message_count messages
+    history_summary = Column(Text)
+    summarized_message_count = Column(Integer, default=0)
+    
     # Status
     status = Column(String(50), default='active')  # 'active', 'ended', 'timeout'
     
@@ -66,3 +70,8 @@ class AgentMessage(Base):
     
     # Timestamp
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        # Latest-N history reads per session
+        Index('idx_agent_messages_session_created', 'session_id', created_at.desc()),
+    )
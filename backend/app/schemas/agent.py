@@ -41,12 +41,22 @@ class AgentConfig(BaseModel):
     denoising_mode: str = 'noise-cancellation'
     pii_redaction_enabled: bool = False
     pii_redaction_list: List[str] = Field(default_factory=list)
+    pii_redact_user_input: bool = False
     data_storage_policy: str = 'everything'
     webhook_url: Optional[str] = None
     webhook_timeout_ms: int = 5000
     custom_headers: Dict[str, str] = Field(default_factory=dict)
     enabled_mcp_servers: List[str] = Field(default_factory=list)
     knowledge_base_ids: List[str] = Field(default_factory=list)
+    context_max_history_tokens: int = 2000
+    context_keep_last_turns: int = 4
+    context_summary_enabled: bool = True
+    knowledge_max_tokens: int = 1500
+    knowledge_max_chunks: int = 4
+    knowledge_mmr_lambda: float = 0.7
+    response_cache_enabled: bool = False
+    response_cache_similarity_threshold: float = 0.95
+    response_cache_ttl_seconds: int = 3600
 
 
 class AgentCreate(BaseModel):
@@ -0,0 +1,241 @@
+"""
+Call log writer
+Batches call_logs inserts off the inbound call path
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from ..config import settings
+from ..database import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+_INSERT_CALL_LOG = text("""
+    INSERT INTO call_logs (organization_id, agent_id, phone_number_id, session_id, direction, caller_number, status)
+    VALUES (:org_id, :agent_id, :phone_id, :session_id, :direction, :caller, :status)
+""")
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CallLogWriter:
+    """
+    Queues call log rows and inserts them in batches.
+
+    Rows are written once ``batch_size`` are pending or ``flush_interval_ms``
+    after the first pending row, whichever comes first, in one executemany
+    and one commit. A failed batch is retried ``write_attempts`` times with
+    doubling backoff, then appended to a per-process JSONL file in
+    ``spill_dir``; spilled rows are written again when the writer starts and
+    after its next successful batch. Call setup never waits on any of this.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval_ms: float,
+        write_attempts: int,
+        retry_backoff_ms: float,
+        spill_dir: str
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = flush_interval_ms / 1000.0
+        self.write_attempts = max(1, write_attempts)
+        self.retry_backoff_seconds = retry_backoff_ms / 1000.0
+        self.spill_dir = spill_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._spilled_here = False
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    def log_call(
+        self,
+        org_id,
+        agent_id,
+        phone_id,
+        session_id: str,
+        caller: Optional[str],
+        direction: str = "inbound",
+        status: str = "active"
+    ):
+        """Queue a call log row; returns immediately"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        self._queue.put_nowait({
+            "org_id": org_id,
+            "agent_id": agent_id,
+            "phone_id": phone_id,
+            "session_id": session_id,
+            "direction": direction,
+            "caller": caller,
+            "status": status,
+        })
+
+    async def _run(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        # Rows spilled by an earlier (possibly crashed) process
+        await self._replay()
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            rows = [row]
+            deadline = loop.time() + self.flush_interval_seconds
+            stopping = False
+            while len(rows) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._write(rows)
+            if stopping:
+                return
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        """Insert a batch, retrying with backoff; spill it to disk if that fails"""
+        for attempt in range(self.write_attempts):
+            try:
+                await self._insert(rows)
+            except Exception as e:
+                if attempt + 1 == self.write_attempts:
+                    logger.error("Failed to write %d call logs, spilling to disk: %s", len(rows), e)
+                    await self._spill(rows)
+                    return
+                self.retries += 1
+                delay = self.retry_backoff_seconds * 2 ** attempt
+                logger.warning("Call log write failed, retrying in %.2fs: %s", delay, e)
+                await asyncio.sleep(delay)
+            else:
+                break
+
+        # The database is reachable again; catch up on what was spilled
+        if self._spilled_here:
+            self._spilled_here = False
+            await self._replay()
+
+    async def _insert(self, rows: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as db:
+            await db.execute(_INSERT_CALL_LOG, rows)
+            await db.commit()
+        self.written += len(rows)
+        self.batches += 1
+
+    def _spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"call_logs-{os.getpid()}.jsonl")
+
+    async def _spill(self, rows: List[Dict[str, Any]]):
+        try:
+            await asyncio.to_thread(self._append_spill, rows)
+            self.spilled += len(rows)
+            self._spilled_here = True
+        except Exception:
+            logger.exception("Could not spill %d call logs; rows lost: %s", len(rows), rows)
+
+    def _append_spill(self, rows: List[Dict[str, Any]]):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self._spill_path(), "a", encoding="utf-8") as f:
+            for row in rows:
+                # ids may be UUID objects; they are sent back as strings
+                f.write(json.dumps(row, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _replay(self):
+        """Write rows spilled by this or earlier processes"""
+        try:
+            claimed = await asyncio.to_thread(self._claim_spills)
+        except Exception:
+            logger.exception("Could not read spilled call logs")
+            return
+        for path, rows in claimed:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                try:
+                    await self._insert(batch)
+                except Exception as e:
+                    # Still down: put the rest back for the next attempt
+                    logger.warning("Replaying spilled call logs failed: %s", e)
+                    await self._spill(rows[start:])
+                    break
+                self.replayed += len(batch)
+            await asyncio.to_thread(os.remove, path)
+
+    def _claim_spills(self) -> List[Any]:
+        """Take ownership of spill files by renaming them; other processes skip them"""
+        if not os.path.isdir(self.spill_dir):
+            return []
+        claimed = []
+        for name in sorted(os.listdir(self.spill_dir)):
+            path = os.path.join(self.spill_dir, name)
+            if ".jsonl.replay-" in name:
+                # Left behind by a process that died mid-replay
+                if _process_alive(int(name.rsplit("-", 1)[1])):
+                    continue
+            elif not name.endswith(".jsonl"):
+                continue
+            replaying = f"{path.split('.jsonl')[0]}.jsonl.replay-{os.getpid()}"
+            try:
+                os.replace(path, replaying)
+            except FileNotFoundError:
+                continue
+            with open(replaying, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            claimed.append((replaying, rows))
+        return claimed
+
+    async def aclose(self):
+        """Write pending rows and stop"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Writer counters"""
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+        }
+
+
+# Global writer instance
+call_log_writer = CallLogWriter(
+    batch_size=settings.CALL_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.CALL_LOG_FLUSH_INTERVAL_MS,
+    write_attempts=settings.CALL_LOG_WRITE_ATTEMPTS,
+    retry_backoff_ms=settings.CALL_LOG_RETRY_BACKOFF_MS,
+    spill_dir=settings.CALL_LOG_SPILL_DIR
+)
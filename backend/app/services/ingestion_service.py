@@ -0,0 +1,225 @@
+"""
+Knowledge base ingestion service
+Streams documents into chunks, embeds them in batches and upserts them
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Union
+from ..config import settings
+from ..langgraph.knowledge import kb_service
+
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".rst", ".html", ".csv"}
+
+
+def iter_documents(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield documents from a file or directory without loading it all.
+
+    ``.jsonl`` files hold one ``{"text": ..., "metadata": {...}}`` object per
+    line; other text files are one document each. Documents without a
+    ``source`` get the file name, which re-ingestion uses to find stale chunks.
+    """
+    if os.path.isdir(path):
+        for root, _, names in os.walk(path):
+            for name in sorted(names):
+                yield from iter_documents(os.path.join(root, name))
+        return
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    doc = json.loads(line)
+                    doc.setdefault("metadata", {}).setdefault("source", os.path.basename(path))
+                    yield doc
+    elif extension in TEXT_EXTENSIONS:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield {"text": f.read(), "metadata": {"source": os.path.basename(path)}}
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Split text into chunks of at most ``chunk_size`` characters.
+
+    Paragraphs and then sentences are packed greedily; consecutive chunks
+    share up to ``overlap`` trailing characters.
+    """
+    pieces: List[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_size:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            # Hard-split sentences that are longer than a chunk
+            for start in range(0, len(sentence), chunk_size):
+                pieces.append(sentence[start:start + chunk_size])
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            if tail and len(tail) + 1 + len(piece) <= chunk_size:
+                current = f"{tail} {piece}"
+            else:
+                current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_id(kb_id: str, text: str) -> str:
+    """Content hash; unchanged chunks keep their id across re-ingestion"""
+    return hashlib.sha256(f"{kb_id}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class IngestionService:
+    """Bulk ingestion into the configured vector store"""
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+        self.chunk_overlap = settings.INGEST_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.concurrency = concurrency or settings.INGEST_CONCURRENCY
+
+    async def ingest(
+        self,
+        kb_id: str,
+        documents: Union[Iterable[Dict[str, Any]], AsyncIterator[Dict[str, Any]]],
+        progress: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Chunk, embed and upsert documents into a knowledge base.
+
+        Chunks whose content hash is already stored are not re-embedded, and
+        chunks of a re-ingested source that it no longer produces are deleted.
+        At most ``concurrency`` batches are in flight, so memory stays
+        bounded regardless of corpus size. ``progress`` is updated in place.
+        """
+        backend = kb_service.backend
+        if backend is None:
+            raise ValueError("Knowledge base vector store is not configured")
+
+        stats = progress if progress is not None else {}
+        stats.update({
+            "kb_id": kb_id,
+            "documents": 0,
+            "chunks": 0,
+            "duplicates": 0,
+            "unchanged": 0,
+            "embedded": 0,
+            "deleted": 0,
+        })
+
+        seen = set()
+        sources = set()
+        batch: List[Dict[str, Any]] = []
+        in_flight: set = set()
+
+        async def flush(pending: List[Dict[str, Any]]):
+            # Bound concurrency: wait for a slot before starting another batch
+            while len(in_flight) >= self.concurrency:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                for task in done:
+                    task.result()
+            task = asyncio.create_task(self._process_batch(kb_id, pending, stats))
+            in_flight.add(task)
+
+        try:
+            async for doc in self._aiter(documents):
+                stats["documents"] += 1
+                metadata = doc.get("metadata") or {}
+                if metadata.get("source") is not None:
+                    sources.add(metadata["source"])
+                for text in chunk_text(doc.get("text", ""), self.chunk_size, self.chunk_overlap):
+                    stats["chunks"] += 1
+                    cid = chunk_id(kb_id, text)
+                    if cid in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(cid)
+                    batch.append({"id": cid, "text": text, "metadata": metadata})
+                    if len(batch) >= self.batch_size:
+                        await flush(batch)
+                        batch = []
+
+            if batch:
+                await flush(batch)
+            if in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_EXCEPTION)
+                in_flight.difference_update(done)
+                for task in done:
+                    task.result()
+        except BaseException:
+            # Don't leave batches embedding after the job has failed
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+
+        # Only after every batch landed, so a failed run never deletes chunks
+        if sources:
+            stats["deleted"] = await backend.delete_stale(kb_id, sources, seen)
+
+        # Serve fresh results for this knowledge base from now on
+        kb_service.invalidate(kb_id)
+        return stats
+
+    async def _process_batch(self, kb_id: str, batch: List[Dict[str, Any]], stats: Dict[str, Any]):
+        """Embed the changed chunks of a batch and upsert them"""
+        backend = kb_service.backend
+        existing = await backend.existing_ids(kb_id, [chunk["id"] for chunk in batch])
+        changed = [chunk for chunk in batch if chunk["id"] not in existing]
+        stats["unchanged"] += len(batch) - len(changed)
+        if not changed:
+            return
+
+        texts = [chunk["text"] for chunk in changed]
+        embeddings = await kb_service.embeddings.aembed_documents(texts)
+        await backend.upsert(
+            kb_id,
+            ids=[chunk["id"] for chunk in changed],
+            embeddings=embeddings,
+            texts=texts,
+            metadatas=[chunk["metadata"] for chunk in changed]
+        )
+        stats["embedded"] += len(changed)
+
+    @staticmethod
+    async def _aiter(documents) -> AsyncIterator[Dict[str, Any]]:
+        if hasattr(documents, "__aiter__"):
+            async for doc in documents:
+                yield doc
+            return
+
+        # Sync sources read files; step them in a thread so the loop keeps serving
+        documents = iter(documents)
+        done = object()
+        while True:
+            doc = await asyncio.to_thread(next, documents, done)
+            if doc is done:
+                return
+            yield doc
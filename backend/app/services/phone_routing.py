@@ -0,0 +1,150 @@
+"""
+Phone number routing
+In-memory routing table for inbound calls, refreshed by Postgres notifications and a short TTL
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, NamedTuple, Optional
+from sqlalchemy import text
+from ..config import settings
+from ..database import AsyncSessionLocal
+
+
+# Sent by the phone_numbers trigger in db/master_schema.sql
+CHANGE_CHANNEL = "phone_numbers_changed"
+
+_ROUTES_QUERY = """
+    SELECT
+        pn.phone_number,
+        pn.id as phone_id,
+        pn.agent_id,
+        pn.organization_id,
+        pn.status,
+        o.credits_balance
+    FROM phone_numbers pn
+    JOIN organizations o ON pn.organization_id = o.id
+"""
+
+
+class Route(NamedTuple):
+    """Where calls to one phone number go"""
+    phone_id: Any
+    agent_id: Any
+    organization_id: Any
+    status: str
+    credits_balance: Any
+
+
+class PhoneRoutingTable:
+    """
+    Phone number -> route, held in memory.
+
+    The whole table is loaded at startup and reloaded in the background once
+    it is older than ``ttl_seconds`` (lookups keep using the previous copy
+    meanwhile). Single numbers are refreshed as soon as a change notification
+    arrives. Credit balances are only as fresh as the last reload.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._routes: Dict[str, Route] = {}
+        self._loaded_at: Optional[float] = None
+        self._loading: Optional[asyncio.Task] = None
+        self._listener = None
+        # Notification refreshes; the loop only keeps weak references to tasks
+        self._refreshes: set = set()
+        self.lookups = 0
+        self.reloads = 0
+        self.notifications = 0
+
+    async def lookup(self, number: str) -> Optional[Route]:
+        """Route for a number, or None if it is not configured"""
+        self.lookups += 1
+        if self._loaded_at is None:
+            await self.load()
+        elif time.monotonic() - self._loaded_at > self.ttl_seconds:
+            self._schedule_load()
+        return self._routes.get(number)
+
+    async def load(self):
+        """(Re)load the whole table; concurrent callers share one query"""
+        self._schedule_load()
+        await asyncio.shield(self._loading)
+
+    def _schedule_load(self):
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+            self._loading.add_done_callback(self._loaded)
+
+    def _loaded(self, task: asyncio.Task):
+        self._loading = None
+        if not task.cancelled() and task.exception():
+            print(f"⚠️ Phone routing reload failed: {task.exception()}")
+
+    async def _load(self):
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(text(_ROUTES_QUERY))).all()
+        self._routes = {row.phone_number: self._route(row) for row in rows}
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+
+    async def refresh(self, number: str):
+        """Reload one number after it changed"""
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                text(_ROUTES_QUERY + " WHERE pn.phone_number = :number"),
+                {"number": number}
+            )).first()
+        if row is None:
+            self._routes.pop(number, None)
+        else:
+            self._routes[number] = self._route(row)
+
+    @staticmethod
+    def _route(row) -> Route:
+        return Route(row.phone_id, row.agent_id, row.organization_id, row.status, row.credits_balance)
+
+    async def listen(self):
+        """Subscribe to change notifications; the TTL still applies without them"""
+        import asyncpg
+
+        dsn = settings.async_database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+        try:
+            self._listener = await asyncpg.connect(dsn)
+            await self._listener.add_listener(CHANGE_CHANNEL, self._on_notification)
+            print(f"✅ Phone routing listening on {CHANGE_CHANNEL}")
+        except Exception as e:
+            self._listener = None
+            print(f"⚠️ Phone routing notifications unavailable, using {self.ttl_seconds:.0f}s TTL: {e}")
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.notifications += 1
+        task = asyncio.create_task(self._refresh_quietly(payload))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _refresh_quietly(self, number: str):
+        try:
+            await self.refresh(number)
+        except Exception as e:
+            print(f"⚠️ Phone routing refresh failed for {number}: {e}")
+
+    async def aclose(self):
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Table counters"""
+        return {
+            "numbers": len(self._routes),
+            "lookups": self.lookups,
+            "reloads": self.reloads,
+            "notifications": self.notifications,
+            "listening": self._listener is not None,
+        }
+
+
+# Global routing table instance
+phone_routing = PhoneRoutingTable(ttl_seconds=settings.PHONE_ROUTING_TTL_SECONDS)
@@ -2,7 +2,10 @@
 Session management service
 """
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import set_committed_value
 from ..models.session import AgentSession, AgentMessage
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
@@ -13,11 +16,11 @@ class SessionService:
     """Manage agent sessions"""
     
     @staticmethod
-    def create_session(
+    async def create_session(
         session_id: str,
         agent_id: str,
         channel: str,
-        db: Session,
+        db: AsyncSession,
         user_id: Optional[str] = None,
         website_domain: Optional[str] = None,
         ip_address: Optional[str] = None
@@ -38,31 +41,35 @@ class SessionService:
         )
         
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
         
         return session
     
     @staticmethod
-    def get_session(session_id: str, db: Session) -> Optional[AgentSession]:
+    async def get_session(session_id: str, db: AsyncSession) -> Optional[AgentSession]:
         """Get session by ID"""
-        return db.query(AgentSession).filter(
-            AgentSession.session_id == session_id
-        ).first()
+        # History lives in agent_messages; skip the legacy JSON blob
+        result = await db.execute(
+            select(AgentSession)
+            .options(defer(AgentSession.conversation_history))
+            .where(AgentSession.session_id == session_id)
+        )
+        return result.scalars().first()
     
     @staticmethod
-    def get_or_create_session(
+    async def get_or_create_session(
         session_id: str,
         agent_id: str,
         channel: str,
-        db: Session,
+        db: AsyncSession,
         metadata: Optional[Dict] = None
     ) -> AgentSession:
         """Get existing session or create new one"""
-        session = SessionService.get_session(session_id, db)
+        session = await SessionService.get_session(session_id, db)
         
         if not session:
-            session = SessionService.create_session(
+            session = await SessionService.create_session(
                 session_id=session_id,
                 agent_id=agent_id,
                 channel=channel,
@@ -74,46 +81,229 @@ class SessionService:
         return session
     
     @staticmethod
-    def update_activity(session_id: str, db: Session):
+    async def update_activity(session_id: str, db: AsyncSession):
         """Update last activity timestamp"""
-        session = SessionService.get_session(session_id, db)
+        session = await SessionService.get_session(session_id, db)
         if session:
             session.last_activity_at = datetime.utcnow()
-            db.commit()
+            await db.commit()
     
     @staticmethod
-    def add_message_to_history(
+    async def add_message_to_history(
         session: AgentSession,
         role: str,
         content: str,
-        db: Session
+        db: AsyncSession
     ):
         """Add message to session history"""
-        history = session.conversation_history or []
-        history.append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await SessionService.add_messages(
+            session=session,
+            messages=[{"role": role, "content": content}],
+            db=db
+        )
+    
+    @staticmethod
+    async def add_messages(
+        session: AgentSession,
+        messages: List[Dict],
+        db: AsyncSession
+    ):
+        """
+        Append messages to session history in one batched insert.
+        
+        Each message is a dict with ``role`` and ``content`` and optionally
+        ``created_at``, ``tokens_used``, ``latency_ms`` and ``model_used``.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "session_id": session.id,
+                "role": msg["role"],
+                "content": msg["content"],
+                "created_at": msg.get("created_at") or now,
+                "tokens_used": msg.get("tokens_used"),
+                "latency_ms": msg.get("latency_ms"),
+                "model_used": msg.get("model_used"),
+            }
+            for msg in messages
+        ]
         
-        session.conversation_history = history
-        session.message_count += 1
-        session.last_activity_at = datetime.utcnow()
-        db.commit()
+        if rows:
+            await db.execute(insert(AgentMessage), rows)
+        
+        # Increment in SQL so concurrent writers to one session don't lose counts
+        await SessionService._adjust_message_count(session, len(rows), db, last_activity_at=now)
+        await db.commit()
+    
+    @staticmethod
+    async def _adjust_message_count(session: AgentSession, delta: int, db: AsyncSession, **values):
+        """Add ``delta`` to message_count atomically and sync the loaded row"""
+        result = await db.execute(
+            update(AgentSession)
+            .where(AgentSession.id == session.id)
+            .values(
+                message_count=func.greatest(func.coalesce(AgentSession.message_count, 0) + delta, 0),
+                **values
+            )
+            .returning(AgentSession.message_count)
+            .execution_options(synchronize_session=False)
+        )
+        # Committed values, so a later flush of the session doesn't write them back
+        set_committed_value(session, "message_count", result.scalar_one())
+        for key, value in values.items():
+            set_committed_value(session, key, value)
     
     @staticmethod
-    def save_message(
+    async def replace_last_message(
+        session: AgentSession,
+        role: str,
+        content: str,
+        db: AsyncSession
+    ):
+        """Rewrite the latest message with ``role``; empty ``content`` removes it"""
+        result = await db.execute(
+            select(AgentMessage.id)
+            .where(AgentMessage.session_id == session.id, AgentMessage.role == role)
+            .order_by(AgentMessage.created_at.desc())
+            .limit(1)
+        )
+        message_id = result.scalar_one_or_none()
+        if message_id is None:
+            return
+        
+        if content:
+            await db.execute(
+                update(AgentMessage).where(AgentMessage.id == message_id).values(content=content)
+            )
+        else:
+            await db.execute(delete(AgentMessage).where(AgentMessage.id == message_id))
+            await SessionService._adjust_message_count(session, -1, db)
+        await db.commit()
+    
+    @staticmethod
+    async def get_recent_history(
+        session: AgentSession,
+        db: AsyncSession,
+        limit: int
+    ) -> List[Dict]:
+        """Get the last ``limit`` messages of a session, oldest first"""
+        if limit <= 0:
+            return []
+        
+        result = await db.execute(
+            select(AgentMessage.role, AgentMessage.content)
+            .where(AgentMessage.session_id == session.id)
+            .order_by(AgentMessage.created_at.desc())
+            .limit(limit)
+        )
+        history = [
+            {"role": row.role, "content": row.content}
+            for row in reversed(result.all())
+        ]
+        
+        if not history and session.message_count:
+            history = await SessionService._migrate_legacy_history(session, db)
+            history = history[-limit:]
+        
+        return history
+    
+    @staticmethod
+    async def get_history_slice(
+        session_pk,
+        offset: int,
+        limit: int,
+        db: AsyncSession
+    ) -> List[Dict]:
+        """Get ``limit`` messages of a session starting ``offset`` from the oldest"""
+        result = await db.execute(
+            select(AgentMessage.role, AgentMessage.content)
+            .where(AgentMessage.session_id == session_pk)
+            .order_by(AgentMessage.created_at.asc())
+            .offset(offset)
+            .limit(limit)
+        )
+        return [{"role": row.role, "content": row.content} for row in result.all()]
+    
+    @staticmethod
+    async def update_summary(
+        session_pk,
+        summary: str,
+        expected_count: int,
+        new_count: int,
+        db: AsyncSession
+    ) -> bool:
+        """
+        Store a new rolling summary.
+        
+        Only applies if no other writer advanced summarized_message_count
+        since ``expected_count`` was read; returns whether it applied.
+        """
+        result = await db.execute(
+            update(AgentSession)
+            .where(
+                AgentSession.id == session_pk,
+                func.coalesce(AgentSession.summarized_message_count, 0) == expected_count
+            )
+            .values(
+                history_summary=summary,
+                summarized_message_count=new_count
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+    
+    @staticmethod
+    async def _migrate_legacy_history(
+        session: AgentSession,
+        db: AsyncSession
+    ) -> List[Dict]:
+        """
+        Move a session's conversation_history JSON blob into agent_messages.
+        
+        Runs once per legacy session; the rows are committed with the turn.
+        """
+        legacy = await db.scalar(
+            select(AgentSession.conversation_history)
+            .where(AgentSession.id == session.id)
+        ) or []
+        
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "session_id": session.id,
+                "role": msg["role"],
+                "content": msg["content"],
+                "created_at": (
+                    datetime.fromisoformat(msg["timestamp"])
+                    if msg.get("timestamp") else datetime.utcnow()
+                ),
+            }
+            for msg in legacy
+        ]
+        if rows:
+            await db.execute(insert(AgentMessage), rows)
+            await db.execute(
+                update(AgentSession)
+                .where(AgentSession.id == session.id)
+                .values(conversation_history=[])
+            )
+        
+        return [{"role": row["role"], "content": row["content"]} for row in rows]
+    
+    @staticmethod
+    async def save_message(
         session_id: str,
         role: str,
         content: str,
-        db: Session,
+        db: AsyncSession,
         audio_url: Optional[str] = None,
         tokens_used: Optional[int] = None,
         latency_ms: Optional[int] = None,
         model_used: Optional[str] = None
     ) -> AgentMessage:
         """Save message to database"""
-        session = SessionService.get_session(session_id, db)
+        session = await SessionService.get_session(session_id, db)
         if not session:
             raise ValueError(f"Session {session_id} not found")
         
@@ -129,60 +319,65 @@ class SessionService:
         )
         
         db.add(message)
-        db.commit()
-        db.refresh(message)
+        await db.commit()
+        await db.refresh(message)
         
         return message
     
     @staticmethod
-    def get_session_messages(
+    async def get_session_messages(
         session_id: str,
-        db: Session,
+        db: AsyncSession,
         limit: Optional[int] = None
     ) -> List[AgentMessage]:
         """Get messages for a session"""
-        session = SessionService.get_session(session_id, db)
+        session = await SessionService.get_session(session_id, db)
         if not session:
             return []
         
-        query = db.query(AgentMessage).filter(
+        query = select(AgentMessage).where(
             AgentMessage.session_id == session.id
         ).order_by(AgentMessage.created_at)
         
         if limit:
             query = query.limit(limit)
         
-        return query.all()
+        result = await db.execute(query)
+        return list(result.scalars().all())
     
     @staticmethod
-    def end_session(session_id: str, db: Session):
+    async def end_session(session_id: str, db: AsyncSession):
         """End session"""
-        session = SessionService.get_session(session_id, db)
+        session = await SessionService.get_session(session_id, db)
         if session:
             session.status = 'ended'
             session.ended_at = datetime.utcnow()
-            db.commit()
+            await db.commit()
     
     @staticmethod
-    def cleanup_inactive_sessions(hours: int, db: Session) -> int:
+    async def cleanup_inactive_sessions(hours: int, db: AsyncSession) -> int:
         """Clean up sessions inactive for X hours"""
         cutoff = datetime.utcnow() - timedelta(hours=hours)
         
-        count = db.query(AgentSession).filter(
-            AgentSession.last_activity_at < cutoff,
-            AgentSession.status == 'active'
-        ).update({
-            'status': 'timeout',
-            'ended_at': datetime.utcnow()
-        })
+        result = await db.execute(
+            update(AgentSession).where(
+                AgentSession.last_activity_at < cutoff,
+                AgentSession.status == 'active'
+            ).values(
+                status='timeout',
+                ended_at=datetime.utcnow()
+            )
+        )
         
-        db.commit()
-        return count
+        await db.commit()
+        return result.rowcount
     
     @staticmethod
-    def get_active_session_count(agent_id: str, db: Session) -> int:
+    async def get_active_session_count(agent_id: str, db: AsyncSession) -> int:
         """Get count of active sessions for an agent"""
-        return db.query(AgentSession).filter(
-            AgentSession.agent_id == agent_id,
-            AgentSession.status == 'active'
-        ).count()
+        return await db.scalar(
+            select(func.count()).select_from(AgentSession).where(
+                AgentSession.agent_id == agent_id,
+                AgentSession.status == 'active'
+            )
+        )
@@ -0,0 +1,130 @@
+"""
+Audio output
+Resamples streamed 16-bit PCM and feeds paced fixed-size frames to an audio source
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional, Union
+import numpy as np
+
+
+PCM = Union[bytes, bytearray, memoryview]
+
+
+class PCMResampler:
+    """
+    Streaming linear-interpolation resampler for 16-bit mono PCM.
+
+    Keeps the fractional read position and the last input sample between
+    chunks, so chunk boundaries do not click.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.step = input_rate / output_rate
+        # Position of the next output sample, relative to the previous sample
+        self._position = 0.0
+        self._previous: Optional[np.ndarray] = None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.input_rate == self.output_rate or len(samples) == 0:
+            return samples
+        if self._previous is None:
+            # First chunk: start exactly on its first sample
+            source = samples.astype(np.float32)
+            self._position = 0.0
+        else:
+            source = np.concatenate((self._previous, samples.astype(np.float32)))
+
+        last = len(source) - 1
+        count = int(np.floor((last - self._position) / self.step)) + 1
+        if count <= 0:
+            self._previous = source[-1:]
+            self._position -= last
+            return np.zeros(0, dtype=np.int16)
+
+        positions = self._position + self.step * np.arange(count, dtype=np.float64)
+        out = np.interp(positions, np.arange(len(source)), source)
+
+        # Carry the last input sample and the next position relative to it
+        self._position = positions[-1] + self.step - last
+        self._previous = source[-1:]
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+
+class AudioOutput:
+    """
+    Paced playback into a LiveKit ``rtc.AudioSource``.
+
+    PCM chunks are resampled to the source rate and sliced into fixed
+    ``frame_ms`` frames from one reusable buffer. Capture is paced so no more
+    than ``max_lead_ms`` of audio sits in the source queue, which keeps
+    interruptions responsive; playback starts with the first chunk.
+    """
+
+    def __init__(self, source, frame_ms: int = 20, max_lead_ms: int = 200):
+        from livekit import rtc
+
+        self._rtc = rtc
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.frame_samples = self.sample_rate * frame_ms // 1000
+        self.frame_seconds = frame_ms / 1000.0
+        self.max_lead_seconds = max_lead_ms / 1000.0
+        self._frame = np.zeros(self.frame_samples, dtype=np.int16)
+        self._fill = 0
+        self.samples_played = 0
+
+    async def play(self, chunks: AsyncIterator[PCM], input_rate: int):
+        """Play a stream of 16-bit mono PCM chunks recorded at ``input_rate``"""
+        resampler = PCMResampler(input_rate, self.sample_rate)
+        odd_byte = b""
+        async for chunk in chunks:
+            if odd_byte:
+                chunk = odd_byte + bytes(chunk)
+                odd_byte = b""
+            if len(chunk) % 2:
+                # Network chunks may split a sample
+                odd_byte = bytes(chunk[-1:])
+                chunk = chunk[:-1]
+            samples = np.frombuffer(chunk, dtype=np.int16)
+            await self._write(resampler.process(samples))
+        await self._flush()
+
+    async def _write(self, samples: np.ndarray):
+        offset = 0
+        while offset < len(samples):
+            count = min(self.frame_samples - self._fill, len(samples) - offset)
+            self._frame[self._fill:self._fill + count] = samples[offset:offset + count]
+            self._fill += count
+            offset += count
+            if self._fill == self.frame_samples:
+                await self._capture()
+
+    async def _flush(self):
+        """Pad and send a trailing partial frame"""
+        if self._fill:
+            self._frame[self._fill:] = 0
+            self._fill = self.frame_samples
+            await self._capture()
+
+    async def _capture(self):
+        while self.source.queued_duration > self.max_lead_seconds:
+            await asyncio.sleep(self.frame_seconds)
+
+        frame = self._rtc.AudioFrame(
+            data=self._frame.data,
+            sample_rate=self.sample_rate,
+            num_channels=1,
+            samples_per_channel=self.frame_samples
+        )
+        # capture_frame has consumed the buffer once it returns
+        await self.source.capture_frame(frame)
+        self.samples_played += self._fill
+        self._fill = 0
+
+    def clear(self):
+        """Drop queued audio and any partial frame"""
+        self._fill = 0
+        self.source.clear_queue()
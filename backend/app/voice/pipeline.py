@@ -0,0 +1,245 @@
+"""
+Speech pipeline
+Splits streaming LLM output into sentences and synthesizes them ahead of playback
+"""
+
+import asyncio
+import re
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
+from .tts import text_to_speech, text_to_speech_stream
+from ..config import settings
+
+
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+_CLAUSE_END = re.compile(r"[,;:—–]\s+")
+
+
+class SentenceSplitter:
+    """
+    Incremental splitter for streamed text.
+
+    Emits a chunk at each sentence end; long sentences are cut at clause
+    boundaries once they reach ``MIN_CLAUSE_CHARS`` and hard-cut at the last
+    space past ``MAX_CHUNK_CHARS``. The first chunk may be cut at a clause
+    earlier so speech can start sooner.
+    """
+
+    MIN_CLAUSE_CHARS = 60
+    FIRST_CLAUSE_CHARS = 20
+    MAX_CHUNK_CHARS = 240
+
+    def __init__(self):
+        self._buffer = ""
+        self._emitted = 0
+
+    def feed(self, delta: str) -> List[str]:
+        """Add streamed text; return the chunks completed by it"""
+        self._buffer += delta
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+                self._emitted += 1
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return whatever text remains at the end of the stream"""
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        return [chunk] if chunk else []
+
+    def _find_cut(self) -> Optional[int]:
+        match = _SENTENCE_END.search(self._buffer)
+        if match:
+            return match.end()
+
+        min_clause = self.FIRST_CLAUSE_CHARS if self._emitted == 0 else self.MIN_CLAUSE_CHARS
+        if len(self._buffer) >= min_clause:
+            clause = _CLAUSE_END.search(self._buffer, min_clause - 1)
+            if clause:
+                return clause.end()
+
+        if len(self._buffer) > self.MAX_CHUNK_CHARS:
+            space = self._buffer.rfind(" ", 0, self.MAX_CHUNK_CHARS)
+            return space + 1 if space > 0 else self.MAX_CHUNK_CHARS
+        return None
+
+
+async def speech_chunks(
+    events: AsyncIterator[Dict[str, Any]],
+    final: Dict[str, Any]
+) -> AsyncIterator[str]:
+    """
+    Turn ``execute_text_stream`` events into speakable text chunks.
+
+    The final message frame is stored in ``final``. Responses that were not
+    streamed token by token (e.g. response cache hits) are split from the
+    final message instead.
+    """
+    splitter = SentenceSplitter()
+    streamed = False
+    try:
+        async for event in events:
+            if event["type"] == "token":
+                streamed = True
+                for chunk in splitter.feed(event["content"]):
+                    yield chunk
+            elif event["type"] == "message":
+                final.update(event)
+                if not streamed:
+                    for chunk in splitter.feed(event["content"] + " "):
+                        yield chunk
+        for chunk in splitter.flush():
+            yield chunk
+    finally:
+        # Closed early, release the event source (and its turn) right away
+        if hasattr(events, "aclose"):
+            await events.aclose()
+
+
+class _Prefetch:
+    """Audio of one chunk, read from the provider in the background"""
+
+    def __init__(self, stream: AsyncIterator[bytes]):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._fill(stream))
+
+    async def _fill(self, stream: AsyncIterator[bytes]):
+        try:
+            async for chunk in stream:
+                self._queue.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._queue.put_nowait(e)
+            return
+        self._queue.put_nowait(None)
+
+    def cancel(self):
+        self._task.cancel()
+
+    def __await__(self):
+        # Waits until the provider stream is read (or cancelled)
+        return self._task.__await__()
+
+    async def __aiter__(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+async def _pipeline(
+    chunks: AsyncIterator[str],
+    start: Callable[[str], Any],
+    lookahead: Optional[int]
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Start a job per text chunk, yielding ``(text, job)`` in order.
+
+    At most ``lookahead`` jobs are started ahead of the one being consumed;
+    reading more text waits until playback catches up. Closing the iterator
+    cancels outstanding jobs and waits until they, and the text source, have
+    unwound.
+    """
+    lookahead = lookahead or settings.TTS_PIPELINE_LOOKAHEAD
+    # The producer holds one more finished-or-running job while it waits
+    pending: asyncio.Queue = asyncio.Queue(maxsize=max(1, lookahead - 1))
+
+    async def produce():
+        try:
+            async for text in chunks:
+                job = start(text)
+                try:
+                    await pending.put((text, job))
+                except asyncio.CancelledError:
+                    job.cancel()
+                    raise
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Surface errors from the text source in order
+            await pending.put(e)
+            return
+        finally:
+            # Cancelled between chunks, the source would otherwise stay
+            # suspended (holding its turn and db session) until collected
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+        await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    current = None
+    try:
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            current = item[1]
+            yield item
+    finally:
+        producer.cancel()
+        jobs = [] if current is None else [current]
+        while not pending.empty():
+            item = pending.get_nowait()
+            if isinstance(item, tuple):
+                jobs.append(item[1])
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(producer, *jobs, return_exceptions=True)
+
+
+async def synthesize_chunks(
+    chunks: AsyncIterator[str],
+    config: Dict[str, Any],
+    lookahead: Optional[int] = None,
+    audio_format: str = "mp3"
+) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    Synthesize text chunks concurrently, yielding ``(text, audio)`` in order.
+
+    See ``_pipeline`` for lookahead and cancellation.
+    """
+    jobs = _pipeline(
+        chunks,
+        lambda text: asyncio.create_task(text_to_speech(text, config, audio_format)),
+        lookahead
+    )
+    try:
+        async for text, task in jobs:
+            yield text, await task
+    finally:
+        await jobs.aclose()
+
+
+async def stream_chunks(
+    chunks: AsyncIterator[str],
+    config: Dict[str, Any],
+    lookahead: Optional[int] = None,
+    audio_format: str = "pcm"
+) -> AsyncIterator[Tuple[str, AsyncIterator[bytes]]]:
+    """
+    Like ``synthesize_chunks``, but each chunk's audio is an async iterator
+    that yields as the provider streams, so playback starts before a
+    sentence is fully synthesized. Consume each iterator before the next.
+    """
+    jobs = _pipeline(
+        chunks,
+        lambda text: _Prefetch(text_to_speech_stream(text, config, audio_format)),
+        lookahead
+    )
+    try:
+        async for text, prefetch in jobs:
+            yield text, prefetch.__aiter__()
+    finally:
+        await jobs.aclose()
@@ -1,64 +1,430 @@
 """
 Speech-to-Text implementation
+Async providers with batch and streaming (partial/final transcript) modes
 """
 
-import openai
-from typing import Dict, Any
+import asyncio
 import io
+import json
+import wave
+from typing import AsyncIterator, Dict, Any, List, NamedTuple, Optional, Union
+from urllib.parse import urlencode
+import httpx
+from openai import AsyncOpenAI
 from ..config import settings
 
-# Set OpenAI API key
-openai.api_key = settings.OPENAI_API_KEY
+openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
 
+DEEPGRAM_LISTEN_URL = "https://api.deepgram.com/v1/listen"
+DEEPGRAM_STREAM_URL = "wss://api.deepgram.com/v1/listen"
 
-async def speech_to_text(audio_bytes: bytes, config: Dict[str, Any]) -> str:
-    """Convert speech to text using configured STT provider"""
-    provider = config.get("stt_provider", "whisper")
-    
-    if provider == "whisper":
-        return await whisper_stt(audio_bytes, config)
-    elif provider == "deepgram":
-        return await deepgram_stt(audio_bytes, config)
-    else:
-        raise ValueError(f"Unknown STT provider: {provider}")
-
-
-async def whisper_stt(audio_bytes: bytes, config: Dict) -> str:
-    """OpenAI Whisper STT"""
-    # Create file-like object
-    audio_file = io.BytesIO(audio_bytes)
-    audio_file.name = "audio.webm"
-    
-    # Transcribe
-    response = openai.Audio.transcribe(
-        model="whisper-1",
-        file=audio_file
-    )
-    
-    return response["text"]
-
-
-async def deepgram_stt(audio_bytes: bytes, config: Dict) -> str:
-    """Deepgram STT (alternative)"""
-    try:
-        from deepgram import Deepgram
-        
-        dg_client = Deepgram(settings.DEEPGRAM_API_KEY)
-        
-        source = {"buffer": audio_bytes, "mimetype": "audio/webm"}
-        
-        response = await dg_client.transcription.prerecorded(
-            source,
-            {
-                "punctuate": True,
-                "language": "en",
-                "model": "nova-2"
-            }
+# Frames are 16-bit mono PCM
+SAMPLE_WIDTH = 2
+
+PCM = Union[bytes, bytearray, memoryview]
+
+
+class Transcript(NamedTuple):
+    text: str
+    is_final: bool
+
+
+def pcm_to_wav(pcm: PCM, sample_rate: int) -> bytes:
+    """Wrap 16-bit mono PCM in a WAV container"""
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return out.getvalue()
+
+
+class STTStream:
+    """
+    One streaming recognition session.
+
+    Push PCM frames while the user speaks and iterate to receive partial and
+    final transcripts (from a single consumer). After ``close`` the provider
+    flushes its remaining finals and iteration ends; ``text`` is the
+    utterance so far.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.closed = False
+        self._transcripts: asyncio.Queue = asyncio.Queue()
+        self._finals: List[str] = []
+
+    async def push(self, pcm: PCM):
+        """Send a chunk of 16-bit mono PCM"""
+        if self.closed:
+            raise RuntimeError("STT stream is closed")
+        await self._send(pcm)
+
+    async def close(self):
+        """Signal end of audio; remaining transcripts are still delivered"""
+        if not self.closed:
+            self.closed = True
+            await self._finish()
+
+    async def aclose(self):
+        """Abort recognition and end iteration"""
+        self.closed = True
+        await self._abort()
+        self._end()
+
+    async def result(self) -> str:
+        """Close the stream and wait for the final utterance text"""
+        await self.close()
+        async for _ in self:
+            pass
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return " ".join(self._finals)
+
+    async def __aiter__(self) -> AsyncIterator[Transcript]:
+        while True:
+            item = await self._transcripts.get()
+            if item is None:
+                # Keep the sentinel for other or later iterations
+                self._transcripts.put_nowait(None)
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _emit(self, text: str, is_final: bool):
+        text = text.strip()
+        if not text:
+            return
+        if is_final:
+            self._finals.append(text)
+        self._transcripts.put_nowait(Transcript(text, is_final))
+
+    def _fail(self, error: Exception):
+        self._transcripts.put_nowait(error)
+
+    def _end(self):
+        self._transcripts.put_nowait(None)
+
+    async def _send(self, pcm: PCM):
+        raise NotImplementedError
+
+    async def _finish(self):
+        raise NotImplementedError
+
+    async def _abort(self):
+        pass
+
+
+class STTProvider:
+    """Interface shared by speech-to-text providers"""
+
+    name = "base"
+
+    async def transcribe(self, audio_bytes: bytes, config: Dict[str, Any], mimetype: str = "audio/webm") -> str:
+        """Transcribe a complete audio file"""
+        raise NotImplementedError
+
+    def stream(self, sample_rate: int, config: Dict[str, Any]) -> STTStream:
+        """Start a streaming recognition session over 16-bit mono PCM"""
+        raise NotImplementedError
+
+
+class _BufferedStream(STTStream):
+    """
+    Streaming adapter for batch-only providers.
+
+    Audio is buffered and transcribed as WAV on close. With a partial
+    interval, the audio so far is also transcribed in the background every
+    ``partial_interval_ms`` of new speech (one request in flight at most).
+    """
+
+    def __init__(self, provider: STTProvider, sample_rate: int, config: Dict[str, Any], partial_interval_ms: int):
+        super().__init__(sample_rate)
+        self.provider = provider
+        self.config = config
+        self._pcm = bytearray()
+        self._partial_bytes = sample_rate * SAMPLE_WIDTH * partial_interval_ms // 1000
+        self._next_partial = self._partial_bytes
+        self._partial_task: Optional[asyncio.Task] = None
+
+    async def _send(self, pcm: PCM):
+        self._pcm += pcm
+        if (
+            self._partial_bytes
+            and len(self._pcm) >= self._next_partial
+            and (self._partial_task is None or self._partial_task.done())
+        ):
+            self._next_partial = len(self._pcm) + self._partial_bytes
+            self._partial_task = asyncio.create_task(self._partial(bytes(self._pcm)))
+
+    async def _partial(self, pcm: bytes):
+        try:
+            text = await self.provider.transcribe(
+                pcm_to_wav(pcm, self.sample_rate), self.config, mimetype="audio/wav"
+            )
+            if not self.closed:
+                self._emit(text, is_final=False)
+        except Exception as e:
+            print(f"⚠️ Partial transcription failed: {e}")
+
+    async def _finish(self):
+        await self._abort()
+        try:
+            if self._pcm:
+                text = await self.provider.transcribe(
+                    pcm_to_wav(self._pcm, self.sample_rate), self.config, mimetype="audio/wav"
+                )
+                self._emit(text, is_final=True)
+        except Exception as e:
+            self._fail(e)
+        self._end()
+
+    async def _abort(self):
+        if self._partial_task and not self._partial_task.done():
+            self._partial_task.cancel()
+
+
+class WhisperSTT(STTProvider):
+    """OpenAI Whisper; streaming is emulated by buffering (see _BufferedStream)"""
+
+    name = "whisper"
+
+    async def transcribe(self, audio_bytes: bytes, config: Dict[str, Any], mimetype: str = "audio/webm") -> str:
+        if not openai_client:
+            raise ValueError("OpenAI client not initialized. Check API key.")
+
+        extension = mimetype.split("/")[-1].split(";")[0] or "webm"
+        kwargs = {}
+        if config.get("boosted_keywords"):
+            # Whisper has no keyword boosting; a prompt biases spelling
+            kwargs["prompt"] = ", ".join(config["boosted_keywords"])
+
+        response = await openai_client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(f"audio.{extension}", audio_bytes, mimetype),
+            **kwargs
         )
-        
-        transcript = response["results"]["channels"][0]["alternatives"][0]["transcript"]
-        return transcript
-    except Exception as e:
-        print(f"Deepgram error: {e}")
-        # Fallback to Whisper
-        return await whisper_stt(audio_bytes, config)
+        return response.text
+
+    def stream(self, sample_rate: int, config: Dict[str, Any]) -> STTStream:
+        return _BufferedStream(self, sample_rate, config, settings.STT_WHISPER_PARTIAL_INTERVAL_MS)
+
+
+class _DeepgramStream(STTStream):
+    """Deepgram live transcription over a websocket"""
+
+    def __init__(self, provider: "DeepgramSTT", sample_rate: int, config: Dict[str, Any]):
+        super().__init__(sample_rate)
+        self.provider = provider
+        self.config = config
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        # Audio kept for a batch fallback if the websocket cannot be opened
+        self._fallback_pcm: Optional[bytearray] = None
+        self._task = asyncio.create_task(self._run())
+
+    async def _send(self, pcm: PCM):
+        if self._fallback_pcm is not None:
+            self._fallback_pcm += pcm
+        else:
+            self._outgoing.put_nowait(bytes(pcm))
+
+    async def _finish(self):
+        self._outgoing.put_nowait(None)
+
+    async def _abort(self):
+        self._task.cancel()
+
+    async def _run(self):
+        import websockets
+
+        params = self.provider.params(self.config)
+        params.update({
+            "encoding": "linear16",
+            "sample_rate": self.sample_rate,
+            "channels": 1,
+            "interim_results": "true",
+        })
+        url = f"{DEEPGRAM_STREAM_URL}?{urlencode(params, doseq=True)}"
+        headers = {"Authorization": f"Token {settings.DEEPGRAM_API_KEY}"}
+
+        try:
+            connection = await websockets.connect(url, additional_headers=headers)
+        except Exception as e:
+            print(f"Deepgram error: {e}")
+            await self._fall_back()
+            return
+
+        sender = asyncio.create_task(self._send_loop(connection))
+        try:
+            async for message in connection:
+                payload = json.loads(message)
+                if payload.get("type") != "Results":
+                    continue
+                alternatives = payload["channel"]["alternatives"]
+                if alternatives:
+                    self._emit(alternatives[0]["transcript"], bool(payload.get("is_final")))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            sender.cancel()
+            await connection.close()
+            self._end()
+
+    async def _send_loop(self, connection):
+        while True:
+            chunk = await self._outgoing.get()
+            if chunk is None:
+                # Deepgram flushes pending finals, then closes the socket
+                await connection.send(json.dumps({"type": "CloseStream"}))
+                return
+            await connection.send(chunk)
+
+    async def _fall_back(self):
+        """Finish the utterance with Whisper, like the batch path does"""
+        self._fallback_pcm = bytearray()
+        finished = False
+        while not self._outgoing.empty():
+            chunk = self._outgoing.get_nowait()
+            if chunk is None:
+                finished = True
+            else:
+                self._fallback_pcm += chunk
+        while not finished:
+            chunk = await self._outgoing.get()
+            finished = chunk is None
+        try:
+            text = await get_stt_provider("whisper").transcribe(
+                pcm_to_wav(self._fallback_pcm, self.sample_rate), self.config, mimetype="audio/wav"
+            )
+            self._emit(text, is_final=True)
+        except Exception as e:
+            self._fail(e)
+        self._end()
+
+
+class DeepgramSTT(STTProvider):
+    """Deepgram prerecorded and live transcription"""
+
+    name = "deepgram"
+
+    def params(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        params = {
+            "punctuate": "true",
+            "language": "en",
+            "model": "nova-2",
+        }
+        if config.get("boosted_keywords"):
+            params["keywords"] = list(config["boosted_keywords"])
+        return params
+
+    async def transcribe(self, audio_bytes: bytes, config: Dict[str, Any], mimetype: str = "audio/webm") -> str:
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.post(
+                    DEEPGRAM_LISTEN_URL,
+                    params=self.params(config),
+                    headers={
+                        "Authorization": f"Token {settings.DEEPGRAM_API_KEY}",
+                        "Content-Type": mimetype,
+                    },
+                    content=audio_bytes
+                )
+                response.raise_for_status()
+            results = response.json()["results"]
+            return results["channels"][0]["alternatives"][0]["transcript"]
+        except Exception as e:
+            print(f"Deepgram error: {e}")
+            # Fallback to Whisper
+            return await get_stt_provider("whisper").transcribe(audio_bytes, config, mimetype)
+
+    def stream(self, sample_rate: int, config: Dict[str, Any]) -> STTStream:
+        return _DeepgramStream(self, sample_rate, config)
+
+
+class _FakeStream(STTStream):
+    """Reveals the scripted transcript word by word as audio arrives"""
+
+    def __init__(self, provider: "FakeSTT", sample_rate: int):
+        super().__init__(sample_rate)
+        self.provider = provider
+        self._bytes = 0
+        self._revealed = 0
+
+    async def _send(self, pcm: PCM):
+        self._bytes += memoryview(pcm).nbytes
+        words = self.provider.words_for(self._bytes, self.sample_rate)
+        if len(words) > self._revealed:
+            self._revealed = len(words)
+            self._emit(" ".join(words), is_final=False)
+
+    async def _finish(self):
+        self._emit(self.provider.text_for(self._bytes, self.sample_rate), is_final=True)
+        self._end()
+
+
+class FakeSTT(STTProvider):
+    """
+    Local provider for tests and offline development.
+
+    Returns ``transcript`` (or a description of the audio length) without
+    any network calls; streaming reveals one word per ``seconds_per_word``.
+    """
+
+    name = "fake"
+
+    def __init__(self, transcript: Optional[str] = None, seconds_per_word: float = 0.3):
+        self.transcript = transcript
+        self.seconds_per_word = seconds_per_word
+
+    def text_for(self, num_bytes: int, sample_rate: int) -> str:
+        if self.transcript is not None:
+            return self.transcript
+        return f"[{num_bytes / (sample_rate * SAMPLE_WIDTH):.1f}s of audio]"
+
+    def words_for(self, num_bytes: int, sample_rate: int) -> List[str]:
+        words = self.text_for(num_bytes, sample_rate).split()
+        seconds = num_bytes / (sample_rate * SAMPLE_WIDTH)
+        return words[:int(seconds / self.seconds_per_word)]
+
+    async def transcribe(self, audio_bytes: bytes, config: Dict[str, Any], mimetype: str = "audio/webm") -> str:
+        return self.transcript if self.transcript is not None else "[audio]"
+
+    def stream(self, sample_rate: int, config: Dict[str, Any]) -> STTStream:
+        return _FakeStream(self, sample_rate)
+
+
+_providers: Dict[str, STTProvider] = {
+    "whisper": WhisperSTT(),
+    "deepgram": DeepgramSTT(),
+    "fake": FakeSTT(),
+}
+
+
+def get_stt_provider(name: str) -> STTProvider:
+    """Look up a provider by ``stt_provider`` name"""
+    provider = _providers.get(name)
+    if provider is None:
+        raise ValueError(f"Unknown STT provider: {name}")
+    return provider
+
+
+def register_stt_provider(provider: STTProvider):
+    """Add or replace a provider (e.g. a scripted FakeSTT in tests)"""
+    _providers[provider.name] = provider
+
+
+async def speech_to_text(audio_bytes: bytes, config: Dict[str, Any], mimetype: str = "audio/webm") -> str:
+    """Convert speech to text using configured STT provider"""
+    provider = get_stt_provider(config.get("stt_provider", "whisper"))
+    return await provider.transcribe(audio_bytes, config, mimetype)
+
+
+def start_stt_stream(config: Dict[str, Any], sample_rate: int) -> STTStream:
+    """Start streaming recognition with the configured STT provider"""
+    provider = get_stt_provider(config.get("stt_provider", "whisper"))
+    return provider.stream(sample_rate, config)
@@ -8,8 +8,10 @@ try:
 except ImportError:
     ELEVENLABS_AVAILABLE = False
 
-from openai import OpenAI
-from typing import Dict, Any
+import asyncio
+from openai import AsyncOpenAI
+from typing import AsyncIterator, Dict, Any, List, Sequence, Tuple
+from .tts_cache import tts_cache, tts_cache_key, fixed_phrases
 from ..config import settings
 
 # Initialize clients
@@ -18,57 +20,166 @@ if ELEVENLABS_AVAILABLE and settings.ELEVENLABS_API_KEY:
 else:
     elevenlabs_client = None
 
-openai_client = OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
 
+# provider -> (default voice_id, default voice_model)
+VOICE_DEFAULTS = {
+    "elevenlabs": ("21m00Tcm4TlvDq8ikWAM", "eleven_turbo_v2"),
+    "openai": ("alloy", "tts-1"),
+}
 
-async def text_to_speech(text: str, config: Dict[str, Any]) -> bytes:
-    """Convert text to speech using configured TTS provider"""
-    provider = config.get("voice_provider", "elevenlabs")
-    
-    if provider == "elevenlabs":
-        return await elevenlabs_tts(text, config)
-    elif provider == "openai":
-        return await openai_tts(text, config)
-    else:
+# Raw 16-bit mono PCM ("pcm" format) is requested at this rate from every provider
+PCM_SAMPLE_RATE = 24000
+
+ELEVENLABS_OUTPUT_FORMATS = {
+    "mp3": "mp3_44100_128",
+    "pcm": f"pcm_{PCM_SAMPLE_RATE}",
+}
+
+
+def voice_params(config: Dict[str, Any]) -> Tuple[str, str, str, float]:
+    """Resolve ``(provider, voice_id, voice_model, voice_speed)`` with defaults"""
+    provider = config.get("voice_provider") or "elevenlabs"
+    if provider not in VOICE_DEFAULTS:
         raise ValueError(f"Unknown TTS provider: {provider}")
+    default_voice, default_model = VOICE_DEFAULTS[provider]
+    return (
+        provider,
+        config.get("voice_id") or default_voice,
+        config.get("voice_model") or default_model,
+        float(config.get("voice_speed") or 1.0)
+    )
 
 
-async def elevenlabs_tts(text: str, config: Dict) -> bytes:
-    """ElevenLabs TTS"""
-    if not elevenlabs_client:
-        raise ValueError("ElevenLabs client not initialized. Check API key.")
+def _provider_stream(text: str, config: Dict[str, Any], audio_format: str) -> AsyncIterator[bytes]:
+    provider, voice_id, model, speed = voice_params(config)
+    if provider == "elevenlabs":
+        return elevenlabs_tts(text, voice_id, model, audio_format)
+    return openai_tts(text, voice_id, model, speed, audio_format)
+
+
+def _cache_key(text: str, config: Dict[str, Any], audio_format: str):
+    # Long, one-off responses would only churn the cache
+    if len(text) > settings.TTS_CACHE_MAX_TEXT_CHARS:
+        return None
+    provider, voice_id, model, speed = voice_params(config)
+    return tts_cache_key(provider, voice_id, model, speed, text, audio_format)
+
+
+async def text_to_speech(text: str, config: Dict[str, Any], audio_format: str = "mp3") -> bytes:
+    """
+    Convert text to speech using configured TTS provider (cached).
     
-    voice_id = config.get("voice_id", "21m00Tcm4TlvDq8ikWAM")
-    model = config.get("voice_model", "eleven_turbo_v2")
+    ``audio_format`` is "mp3" or "pcm" (16-bit mono at PCM_SAMPLE_RATE).
+    """
+    async def synthesize() -> bytes:
+        return b"".join([chunk async for chunk in _provider_stream(text, config, audio_format)])
     
-    # Use new ElevenLabs API
-    audio = elevenlabs_client.generate(
-        text=text,
-        voice=voice_id,
-        model=model
+    key = _cache_key(text, config, audio_format)
+    if key is None:
+        return await synthesize()
+    return await tts_cache.get_or_synthesize(key, synthesize)
+
+
+async def text_to_speech_stream(
+    text: str,
+    config: Dict[str, Any],
+    audio_format: str = "mp3"
+) -> AsyncIterator[bytes]:
+    """Like text_to_speech, but yields audio as the provider produces it"""
+    key = _cache_key(text, config, audio_format)
+    if key is not None:
+        cached = await tts_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    chunks = []
+    async for chunk in _provider_stream(text, config, audio_format):
+        chunks.append(chunk)
+        yield chunk
+    
+    # Only complete syntheses are cached
+    if key is not None:
+        await tts_cache.put(key, b"".join(chunks))
+
+
+# PCM for the LiveKit voice worker, MP3 for the HTTP voice endpoints
+PREWARM_FORMATS = ("pcm", "mp3")
+
+
+async def prewarm_tts(config: Dict[str, Any], audio_formats: Sequence[str] = PREWARM_FORMATS) -> List[str]:
+    """Synthesize an agent's fixed phrases into the cache in each format its channels play"""
+    phrases = fixed_phrases(config)
+    jobs = [(phrase, audio_format) for phrase in phrases for audio_format in audio_formats]
+    results = await asyncio.gather(
+        *(text_to_speech(phrase, config, audio_format) for phrase, audio_format in jobs),
+        return_exceptions=True
     )
+    failed = set()
+    for (phrase, audio_format), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ TTS prewarm failed for {phrase!r} ({audio_format}): {result}")
+            failed.add(phrase)
+    return [phrase for phrase in phrases if phrase not in failed]
+
+
+async def elevenlabs_tts(text: str, voice_id: str, model: str, audio_format: str = "mp3") -> AsyncIterator[bytes]:
+    """ElevenLabs TTS (streamed)"""
+    if not elevenlabs_client:
+        raise ValueError("ElevenLabs client not initialized. Check API key.")
+    
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
     
-    # Convert generator to bytes if needed
-    if hasattr(audio, '__iter__') and not isinstance(audio, bytes):
-        audio = b''.join(audio)
+    def generate():
+        # The ElevenLabs client is synchronous; iterate it off the event loop
+        try:
+            audio = elevenlabs_client.generate(
+                text=text,
+                voice=voice_id,
+                model=model,
+                stream=True,
+                output_format=ELEVENLABS_OUTPUT_FORMATS[audio_format]
+            )
+            if isinstance(audio, bytes):
+                audio = [audio]
+            for chunk in audio:
+                if chunk:
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
     
-    return audio
+    worker = loop.run_in_executor(None, generate)
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    await worker
 
 
-async def openai_tts(text: str, config: Dict) -> bytes:
-    """OpenAI TTS"""
+async def openai_tts(
+    text: str,
+    voice: str,
+    model: str,
+    speed: float,
+    audio_format: str = "mp3"
+) -> AsyncIterator[bytes]:
+    """OpenAI TTS (streamed)"""
     if not openai_client:
         raise ValueError("OpenAI client not initialized. Check API key.")
     
-    voice = config.get("voice_id", "alloy")
-    model = config.get("voice_model", "tts-1")
-    speed = config.get("voice_speed", 1.0)
-    
-    response = openai_client.audio.speech.create(
+    async with openai_client.audio.speech.with_streaming_response.create(
         model=model,
         voice=voice,
         input=text,
-        speed=speed
-    )
-    
-    return response.content
+        speed=speed,
+        response_format=audio_format
+    ) as response:
+        async for chunk in response.iter_bytes(4096):
+            yield chunk
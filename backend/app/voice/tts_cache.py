@@ -0,0 +1,204 @@
+"""
+TTS audio cache
+Content-addressed synthesized audio in memory (LRU) and on local disk
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+from ..cache import TTLCache
+from ..config import settings
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Replies the voice worker speaks without the LLM
+CANNED_REPLIES = {
+    "error": "Sorry, something went wrong on my end. Could you say that again?",
+}
+
+# Prune the disk tier after this many writes
+PRUNE_EVERY_WRITES = 100
+
+
+def normalize_tts_text(text: str) -> str:
+    """Collapse whitespace; case and punctuation change the speech"""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def tts_cache_key(
+    provider: str,
+    voice_id: str,
+    voice_model: str,
+    voice_speed: float,
+    text: str,
+    audio_format: str = "mp3"
+) -> str:
+    """Content address of a synthesized phrase"""
+    payload = json.dumps(
+        [provider, voice_id, voice_model, float(voice_speed), normalize_tts_text(text), audio_format],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fixed_phrases(config: Dict[str, Any]) -> List[str]:
+    """Phrases an agent speaks verbatim, worth synthesizing ahead of time"""
+    phrases = []
+    if config.get("greeting"):
+        phrases.append(config["greeting"])
+    if config.get("voicemail_message"):
+        phrases.append(config["voicemail_message"])
+    if config.get("enable_backchannel", True):
+        phrases.extend(config.get("backchannel_words") or [])
+    phrases.extend(CANNED_REPLIES.values())
+    return [phrase for phrase in dict.fromkeys(phrases) if phrase and phrase.strip()]
+
+
+class TTSCache:
+    """
+    Two-tier cache of synthesized audio.
+
+    The memory tier is a byte-bounded LRU; the disk tier stores one file per
+    key under ``root`` and is pruned oldest-first past ``disk_max_bytes``.
+    Concurrent misses for the same key share one synthesis.
+    """
+
+    def __init__(self, root: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.root = root
+        self.disk_max_bytes = disk_max_bytes
+        self.memory = TTLCache(
+            max_entries=100000,
+            ttl_seconds=float("inf"),
+            max_bytes=memory_max_bytes,
+            sizeof=len
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._writes = 0
+        self.disk_hits = 0
+        self.synthesized = 0
+        self.coalesced = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Cached audio from memory or disk, or None"""
+        audio = self.memory.get(key)
+        if audio is None:
+            audio = await asyncio.to_thread(self._read, key)
+            if audio is not None:
+                self.disk_hits += 1
+                self.memory.set(key, audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        """Store audio synthesized outside get_or_synthesize"""
+        self.synthesized += 1
+        self.memory.set(key, audio)
+        await asyncio.to_thread(self._write, key, audio)
+
+    async def get_or_synthesize(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Return cached audio for ``key`` or synthesize and store it"""
+        audio = self.memory.get(key)
+        if audio is not None:
+            return audio
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            audio = await asyncio.to_thread(self._read, key)
+            if audio is not None:
+                self.disk_hits += 1
+            else:
+                audio = await synthesize()
+                self.synthesized += 1
+                await asyncio.to_thread(self._write, key, audio)
+            self.memory.set(key, audio)
+            future.set_result(audio)
+            return audio
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so waiter-less failures are not reported as lost
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+        except FileNotFoundError:
+            return None
+        # Recently used files survive pruning
+        os.utime(path)
+        return audio
+
+    def _write(self, key: str, audio: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+
+        self._writes += 1
+        if self._writes % PRUNE_EVERY_WRITES == 0:
+            self._prune()
+
+    def _prune(self):
+        """Delete least recently used files until the disk tier fits"""
+        files = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        return {
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "synthesized": self.synthesized,
+            "coalesced": self.coalesced,
+            "root": self.root,
+        }
+
+
+# Global cache instance
+tts_cache = TTSCache(
+    root=settings.TTS_CACHE_DIR,
+    memory_max_bytes=settings.TTS_CACHE_MEMORY_MAX_BYTES,
+    disk_max_bytes=settings.TTS_CACHE_DISK_MAX_BYTES
+)
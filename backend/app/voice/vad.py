@@ -0,0 +1,220 @@
+"""
+Voice activity detection
+Energy + zero-crossing VAD over preallocated buffers for live 16-bit PCM
+"""
+
+from typing import Dict, Any, NamedTuple, Optional, Union
+import numpy as np
+from ..config import settings
+
+
+PCM = Union[bytes, bytearray, memoryview]
+
+
+class VADEvent(NamedTuple):
+    """
+    ``kind`` is "start", "speech" or "end"; ``audio`` is the PCM to forward
+    to STT for this step (pre-roll plus the frame on "start").
+    """
+    kind: str
+    audio: memoryview
+
+
+class VoiceActivityDetector:
+    """
+    Streaming VAD for one audio track.
+
+    Frames are classified by RMS energy against an adaptive noise floor,
+    with the zero-crossing rate used to reject low-energy hiss. The last
+    ``pre_roll_ms`` of audio is kept in a ring buffer so utterances include
+    their onset. Utterances are written into one of two preallocated
+    buffers and handed out as memoryviews; an utterance's view stays valid
+    until the utterance after the next one starts. All per-frame work uses
+    preallocated scratch arrays.
+    """
+
+    # Smoothing of the noise floor during non-speech frames
+    NOISE_ALPHA = 0.05
+    # Frames above this zero-crossing rate need twice the energy to count
+    MAX_SPEECH_ZCR = 0.35
+
+    def __init__(
+        self,
+        sample_rate: int,
+        pre_roll_ms: int = 300,
+        min_speech_ms: int = 60,
+        end_silence_ms: int = 700,
+        max_utterance_ms: int = 30000,
+        energy_ratio: float = 3.0,
+        min_rms: float = 60.0,
+        max_frame_samples: int = 4800
+    ):
+        self.sample_rate = sample_rate
+        self.min_speech_samples = sample_rate * min_speech_ms // 1000
+        self.end_silence_samples = sample_rate * end_silence_ms // 1000
+        self.energy_ratio = energy_ratio
+        self.min_rms = min_rms
+        self.noise_floor = min_rms
+
+        # Ring buffer holding the most recent pre-roll audio
+        self._pre_roll = np.zeros(sample_rate * pre_roll_ms // 1000, dtype=np.int16)
+        self._pre_roll_pos = 0
+        self._pre_roll_filled = 0
+
+        # Double-buffered utterance storage; zeroed pages are only committed
+        # once written, so the max-utterance capacity costs little up front
+        capacity = len(self._pre_roll) + sample_rate * max_utterance_ms // 1000
+        self._utterances = [np.zeros(capacity, dtype=np.int16) for _ in range(2)]
+        self._current = 0
+        self._length = 0
+
+        # Per-frame scratch space
+        self._scratch = np.zeros(max_frame_samples, dtype=np.float32)
+        self._signs = np.zeros(max_frame_samples, dtype=bool)
+        self._crossings = np.zeros(max_frame_samples, dtype=bool)
+
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self.last_rms = 0.0
+        self.last_zcr = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], sample_rate: int) -> "VoiceActivityDetector":
+        """VAD tuned by the agent's ``responsiveness`` (higher ends turns sooner)"""
+        responsiveness = max(0.25, float(config.get("responsiveness") or 1.0))
+        end_silence_ms = int(min(2000, max(200, settings.VAD_END_SILENCE_MS / responsiveness)))
+        return cls(
+            sample_rate,
+            pre_roll_ms=settings.VAD_PRE_ROLL_MS,
+            min_speech_ms=settings.VAD_MIN_SPEECH_MS,
+            end_silence_ms=end_silence_ms,
+            max_utterance_ms=settings.VAD_MAX_UTTERANCE_MS,
+            energy_ratio=settings.VAD_ENERGY_RATIO,
+            min_rms=settings.VAD_MIN_RMS
+        )
+
+    @property
+    def utterance(self) -> memoryview:
+        """The current (or just finished) utterance"""
+        return memoryview(self._utterances[self._current][:self._length]).cast("B")
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        """Classify one frame and update the features"""
+        n = len(samples)
+        if n > len(self._scratch):
+            self._grow_scratch(n)
+        if n < 2:
+            return False
+
+        scratch = self._scratch[:n]
+        scratch[:] = samples
+        rms = float(np.sqrt(np.dot(scratch, scratch) / n))
+
+        np.signbit(samples, out=self._signs[:n])
+        np.not_equal(self._signs[1:n], self._signs[:n - 1], out=self._crossings[:n - 1])
+        zcr = np.count_nonzero(self._crossings[:n - 1]) / (n - 1)
+
+        self.last_rms = rms
+        self.last_zcr = zcr
+
+        threshold = max(self.min_rms, self.noise_floor * self.energy_ratio)
+        if zcr > self.MAX_SPEECH_ZCR:
+            threshold *= 2
+        return rms > threshold
+
+    def process(self, frame: PCM) -> Optional[VADEvent]:
+        """Feed one frame of 16-bit mono PCM; return what to forward, if anything"""
+        samples = np.frombuffer(frame, dtype=np.int16)
+        speech = self.is_speech(samples)
+
+        if not self.in_speech:
+            if not speech:
+                # Track background level only outside speech
+                self.noise_floor += self.NOISE_ALPHA * (self.last_rms - self.noise_floor)
+                self._speech_run = 0
+                self._push_pre_roll(samples)
+                return None
+
+            self._speech_run += len(samples)
+            self._push_pre_roll(samples)
+            if self._speech_run < self.min_speech_samples:
+                return None
+            return self._start()
+
+        start = self._length
+        full = not self._append(samples)
+        audio = memoryview(self._utterances[self._current][start:self._length]).cast("B")
+
+        if speech:
+            self._silence_run = 0
+        else:
+            self._silence_run += len(samples)
+
+        if full or self._silence_run >= self.end_silence_samples:
+            self.in_speech = False
+            self._speech_run = 0
+            self._silence_run = 0
+            return VADEvent("end", audio)
+        return VADEvent("speech", audio)
+
+    def reset(self):
+        """Drop any utterance in progress"""
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._length = 0
+
+    def _start(self) -> VADEvent:
+        """Begin an utterance with the pre-roll (which includes the onset)"""
+        self._current ^= 1
+        self.in_speech = True
+        self._silence_run = 0
+
+        buffer = self._utterances[self._current]
+        filled = self._pre_roll_filled
+        if filled < len(self._pre_roll):
+            buffer[:filled] = self._pre_roll[:filled]
+        else:
+            # Unroll the ring: oldest samples start at the write position
+            tail = len(self._pre_roll) - self._pre_roll_pos
+            buffer[:tail] = self._pre_roll[self._pre_roll_pos:]
+            buffer[tail:filled] = self._pre_roll[:self._pre_roll_pos]
+        self._length = filled
+        self._pre_roll_pos = 0
+        self._pre_roll_filled = 0
+        return VADEvent("start", self.utterance)
+
+    def _append(self, samples: np.ndarray) -> bool:
+        """Copy samples into the utterance buffer; False once it is full"""
+        buffer = self._utterances[self._current]
+        count = min(len(samples), len(buffer) - self._length)
+        buffer[self._length:self._length + count] = samples[:count]
+        self._length += count
+        return self._length < len(buffer)
+
+    def _push_pre_roll(self, samples: np.ndarray):
+        ring = self._pre_roll
+        size = len(ring)
+        if size == 0:
+            return
+        if len(samples) >= size:
+            ring[:] = samples[-size:]
+            self._pre_roll_pos = 0
+            self._pre_roll_filled = size
+            return
+
+        end = self._pre_roll_pos + len(samples)
+        if end <= size:
+            ring[self._pre_roll_pos:end] = samples
+        else:
+            split = size - self._pre_roll_pos
+            ring[self._pre_roll_pos:] = samples[:split]
+            ring[:end - size] = samples[split:]
+        self._pre_roll_pos = end % size
+        self._pre_roll_filled = min(size, self._pre_roll_filled + len(samples))
+
+    def _grow_scratch(self, n: int):
+        self._scratch = np.zeros(n, dtype=np.float32)
+        self._signs = np.zeros(n, dtype=bool)
+        self._crossings = np.zeros(n, dtype=bool)
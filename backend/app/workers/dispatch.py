@@ -0,0 +1,94 @@
+"""
+Voice worker dispatch
+Worker registry and per-worker call queues in Redis, shared by the API and the voice worker pool
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+import redis.asyncio as redis
+from ..config import settings
+
+
+WORKERS_KEY = "voice:workers"
+
+
+def queue_key(worker_id: str) -> str:
+    """Redis list holding the calls dispatched to a worker"""
+    return f"voice:queue:{worker_id}"
+
+
+class NoVoiceWorkerAvailable(RuntimeError):
+    """Raised when no live worker has a free call slot"""
+
+
+class VoiceDispatcher:
+    """
+    Routes calls to the least-loaded voice worker.
+
+    Workers publish ``{capacity, active, cpu, draining, updated_at}`` to the
+    ``voice:workers`` hash on every heartbeat. A call goes to the live,
+    non-draining worker with the lowest share of its capacity in use
+    (counting calls still waiting in its queue), with CPU load breaking ties.
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._redis: Optional[redis.Redis] = None
+        self.dispatched = 0
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    async def workers(self) -> List[Dict[str, Any]]:
+        """Live workers with their latest status and queue depth"""
+        entries = await self.redis.hgetall(WORKERS_KEY)
+        now = time.time()
+        workers = []
+        for worker_id, raw in entries.items():
+            status = json.loads(raw)
+            if now - status["updated_at"] > settings.VOICE_WORKER_STALE_SECONDS:
+                continue
+            status["worker_id"] = worker_id
+            workers.append(status)
+
+        # Queue depths in one round trip
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for worker in workers:
+                pipe.llen(queue_key(worker["worker_id"]))
+            depths = await pipe.execute()
+        for worker, depth in zip(workers, depths):
+            worker["queued"] = depth
+        return workers
+
+    async def dispatch(self, room_name: str, agent_id: str, exclude: Optional[str] = None) -> str:
+        """Queue a call on the least-loaded worker and return its id"""
+        candidates = []
+        for worker in await self.workers():
+            if worker["draining"] or worker["worker_id"] == exclude:
+                continue
+            load = worker["active"] + worker["queued"]
+            if load >= worker["capacity"]:
+                continue
+            candidates.append((load / worker["capacity"], worker["cpu"], worker["worker_id"]))
+
+        if not candidates:
+            raise NoVoiceWorkerAvailable("No voice worker has capacity for another call")
+
+        _, _, worker_id = min(candidates)
+        job = {"room_name": room_name, "agent_id": agent_id, "dispatched_at": time.time()}
+        await self.redis.lpush(queue_key(worker_id), json.dumps(job))
+        self.dispatched += 1
+        return worker_id
+
+    async def aclose(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+# Global dispatcher instance
+voice_dispatcher = VoiceDispatcher(settings.REDIS_URL)
@@ -1,29 +1,51 @@
 import asyncio
 import os
 import json
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, Optional
 from livekit import rtc
-from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import AsyncSessionLocal
 from ..langgraph.agent_runtime import runtime
+from ..langgraph.turn_queue import Turn, TurnQueueFull
 from ..services.livekit_service import LiveKitService
 
-import numpy as np
-from ..voice.stt import speech_to_text
-from ..voice.tts import text_to_speech
+from ..voice.stt import STTStream, start_stt_stream
+from ..voice.audio_output import AudioOutput
+from ..voice.tts import PCM_SAMPLE_RATE, text_to_speech_stream
+from ..voice.pipeline import speech_chunks, stream_chunks
+from ..voice.tts_cache import CANNED_REPLIES
+from ..voice.vad import VoiceActivityDetector
 
 class VoiceAgent:
     """
     A worker that connects to a LiveKit room as the AI Agent.
     It listens to user audio, transcribes it, queries the LLM, and speaks back.
     """
-    def __init__(self, room_name: str, agent_id: str, db_session: Session):
+    def __init__(self, room_name: str, agent_id: str):
         self.room_name = room_name
         self.agent_id = agent_id
-        self.db = db_session
         self.room = rtc.Room()
         self.audio_out_track: Optional[rtc.LocalAudioTrack] = None
         self.audio_source: Optional[rtc.AudioSource] = None
+        self.audio_output: Optional[AudioOutput] = None
         self.is_speaking = False
+        self.config: dict = {}
+        self.tts_config: dict = {"voice_provider": "openai"}
+        # The room is unique per call, so it doubles as the session id
+        self.session_id = room_name
+        self._turn: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+        # Set once the call is over (caller left or room disconnected)
+        self.finished = asyncio.Event()
+
+    async def run(self):
+        """Serve the room until the call ends"""
+        try:
+            await self.start()
+            await self.finished.wait()
+        finally:
+            await self.close()
 
     async def start(self):
         """Connect to the room and start listening"""
@@ -36,16 +58,25 @@ class VoiceAgent:
             participant_name="AI Assistant"
         )
 
-        # 2. Connect
-        try:
-            await self.room.connect(os.getenv("LIVEKIT_URL"), token)
-            print(f"✅ Connected to room: {self.room_name}")
-        except Exception as e:
-            print(f"❌ Failed to connect: {e}")
+        # 2. Load the agent (config drives STT/TTS provider selection and the
+        # compiled workflow is cached for the first turn) while connecting
+        load, connect = await asyncio.gather(
+            self._load_agent(),
+            self.room.connect(os.getenv("LIVEKIT_URL"), token),
+            return_exceptions=True
+        )
+        if isinstance(load, Exception):
+            print(f"❌ Failed to load agent {self.agent_id}: {load}")
+        if isinstance(connect, Exception):
+            print(f"❌ Failed to connect: {connect}")
+        if isinstance(load, Exception) or isinstance(connect, Exception):
+            self.finished.set()
             return
+        print(f"✅ Connected to room: {self.room_name}")
 
         # 3. Publish Agent's Audio Track (Microphone)
         self.audio_source = rtc.AudioSource(48000, 1)
+        self.audio_output = AudioOutput(self.audio_source)
         self.audio_out_track = rtc.LocalAudioTrack.create_audio_track("agent-voice", self.audio_source)
         await self.room.local_participant.publish_track(self.audio_out_track)
 
@@ -54,11 +85,31 @@ class VoiceAgent:
         def on_track_subscribed(track: rtc.Track, publication: rtc.RemoteTrackPublication, participant: rtc.RemoteParticipant):
             if track.kind == rtc.TrackKind.KIND_AUDIO and not participant.identity.startswith("agent-"):
                 print(f"🎤 Subscribed to audio from {participant.identity}")
-                asyncio.create_task(self.handle_audio_stream(track, participant))
+                task = asyncio.create_task(self.handle_audio_stream(track, participant))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        @self.room.on("participant_disconnected")
+        def on_participant_disconnected(participant: rtc.RemoteParticipant):
+            callers = [
+                p for p in self.room.remote_participants.values()
+                if not p.identity.startswith("agent-")
+            ]
+            if not callers:
+                print(f"📴 {participant.identity} left, ending call")
+                self.finished.set()
 
         @self.room.on("disconnected")
-        def on_disconnected():
+        def on_disconnected(*args):
             print("🔌 Disconnected from room")
+            self.finished.set()
+
+    async def _load_agent(self):
+        self.config = (await runtime.load_agent(self.agent_id))["config"]
+        self.tts_config = {
+            **self.config,
+            "voice_provider": self.config.get("voice_provider") or "openai"
+        }
 
     async def handle_audio_stream(self, track: rtc.RemoteAudioTrack, participant: rtc.RemoteParticipant):
         """
@@ -68,77 +119,157 @@ class VoiceAgent:
         audio_stream = rtc.AudioStream(track)
         print(f"👂 Listening to {participant.identity}...")
         
-        # Audio buffer for VAD
-        buffer = []
-        silence_frames = 0
-        is_speech = False
-        SILENCE_THRESHOLD = 10  # Adjust based on testing
-        SILENCE_DURATION_FRAMES = 20 # Approx 0.5-1s depending on frame rate
+        # Speech frames are streamed to STT while the user is talking
+        vad: Optional[VoiceActivityDetector] = None
+        stt_stream: Optional[STTStream] = None
+        barge_in_samples: Optional[int] = None
+        speech_samples = 0
         
-        async for frame in audio_stream:
-            # Convert to numpy array to check energy
-            data = np.frombuffer(frame.data, dtype=np.int16)
-            amplitude = np.abs(data).mean()
+        async for event in audio_stream:
+            frame = event.frame
+            if vad is None:
+                vad = VoiceActivityDetector.from_config(self.config, frame.sample_rate)
+                barge_in_samples = self.barge_in_samples(frame.sample_rate)
+            
+            result = vad.process(frame.data)
+            if result is None:
+                continue
             
-            if amplitude > SILENCE_THRESHOLD:
-                is_speech = True
-                silence_frames = 0
-                buffer.append(frame.data)
+            if result.kind == "start":
+                stt_stream = start_stt_stream(self.config, frame.sample_rate)
+                speech_samples = 0
             else:
-                if is_speech:
-                    silence_frames += 1
-                    buffer.append(frame.data)
-                    
-                    if silence_frames > SILENCE_DURATION_FRAMES:
-                        # End of speech detected
-                        print("Silence detected, processing speech...")
-                        full_audio = b''.join(buffer)
-                        
-                        # Reset buffer
-                        buffer = []
-                        is_speech = False
-                        silence_frames = 0
-                        
-                        # Process in background
-                        asyncio.create_task(self.process_interaction(full_audio))
-                else:
-                    # Just silence, ignore
-                    pass
-
-    async def process_interaction(self, audio_data: bytes, session_id: str = "default"):
+                speech_samples += frame.samples_per_channel
+            await stt_stream.push(result.audio)
+            
+            # Barge-in: sustained caller speech interrupts the response being
+            # generated or spoken (not a turn still waiting for its transcript)
+            if (
+                barge_in_samples is not None
+                and speech_samples >= barge_in_samples
+                and self.is_speaking
+            ):
+                print("✋ Barge-in, interrupting response")
+                self.stop_speaking()
+            
+            if result.kind == "end":
+                # End of speech detected
+                print("Silence detected, finishing transcript...")
+                self.start_turn(stt_stream)
+                stt_stream = None
+        
+        if stt_stream is not None:
+            await stt_stream.aclose()
+
+    def barge_in_samples(self, sample_rate: int) -> Optional[int]:
+        """Caller speech (in samples) that interrupts the agent; None disables barge-in"""
+        sensitivity = self.config.get("interruption_sensitivity")
+        sensitivity = 1.0 if sensitivity is None else float(sensitivity)
+        if sensitivity <= 0:
+            return None
+        return int(sample_rate * settings.BARGE_IN_MIN_SPEECH_MS / 1000 / sensitivity)
+
+    def start_turn(self, stt_stream: STTStream):
+        """Respond to a finished utterance; turns are queued per session"""
+        task = asyncio.create_task(self.process_utterance(stt_stream))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def process_utterance(self, stt_stream: STTStream):
+        """Wait for the final transcript of a finished utterance, then respond"""
+        try:
+            user_text = await stt_stream.result()
+        except Exception as e:
+            print(f"❌ STT Error: {e}")
+            return
+        await self.process_interaction(user_text)
+
+    async def process_interaction(self, user_text: str):
         """
         Run the agent pipeline
         """
+        # 1. Transcript is already final (streamed STT)
+        if not user_text or len(user_text.strip()) < 2:
+            return
+
+        print(f"👤 User: {user_text}")
+
+        # 2. Wait for this call's previous turn; an utterance arriving while
+        # another is still queued is appended to it instead
         try:
-            # 1. STT
-            print("Transcribing...")
-            user_text = await speech_to_text(audio_data, {"stt_provider": "whisper"})
-            
-            if not user_text or len(user_text.strip()) < 2:
-                return
+            async with runtime.session_turn(self.session_id, user_text, coalesce=True) as turn:
+                if turn.coalesced:
+                    print("➕ Appended to the queued turn")
+                    return
+                self._turn = asyncio.current_task()
+                try:
+                    await self.respond(turn)
+                finally:
+                    self._turn = None
+        except TurnQueueFull as e:
+            print(f"⚠️ Dropping utterance: {e}")
 
-            print(f"👤 User: {user_text}")
-            
-            # 2. Interrupt current speech if any
-            if self.is_speaking:
-                await self.stop_speaking()
-
-            # 3. Get LLM Response
-            result = await runtime.execute_text(
-                agent_id=self.agent_id,
-                user_input=user_text,
-                session_id=session_id,
-                db=self.db,
-                metadata={"channel": "livekit_voice"}
-            )
-            agent_text = result["response"]
-            print(f"🤖 Agent: {agent_text}")
-
-            # 4. TTS & Stream Audio
-            await self.speak(agent_text)
+    async def respond(self, turn: Turn):
+        """Generate and speak the reply to a turn (cancelled on barge-in)"""
+        user_text = turn.user_input
+        try:
+            # 3. Stream the LLM response (short-lived session per turn) and
+            # 4. speak it sentence by sentence while the rest is generated
+            final = {}
+            spoken = []
+            started_at = datetime.utcnow()
+            self.is_speaking = True
+            try:
+                async with AsyncSessionLocal() as db:
+                    events = runtime.execute_text_stream(
+                        agent_id=self.agent_id,
+                        user_input=user_text,
+                        session_id=self.session_id,
+                        db=db,
+                        metadata={"channel": "livekit_voice"},
+                        turn=turn
+                    )
+                    sentences = stream_chunks(speech_chunks(events, final), self.tts_config)
+                    try:
+                        async for text, audio in sentences:
+                            await self.play(audio, text)
+                            spoken.append(text)
+                    finally:
+                        # Cancels generation and synthesis still in flight and
+                        # waits for them, so turn.persisted is settled below
+                        await sentences.aclose()
+            except asyncio.CancelledError:
+                # Barge-in: history keeps only what the caller heard
+                await asyncio.shield(
+                    self.record_interruption(user_text, " ".join(spoken), turn.persisted, started_at)
+                )
+                raise
+            finally:
+                self.is_speaking = False
+            print(f"🤖 Agent: {final.get('content', '')}")
             
         except Exception as e:
             print(f"❌ Error in interaction: {e}")
+            # Pre-synthesized on publish, so this plays without a TTS round trip
+            await self.speak(CANNED_REPLIES["error"])
+
+    async def record_interruption(self, user_text: str, spoken: str, persisted: bool, started_at: datetime):
+        """Store the spoken part of an interrupted response"""
+        print(f"🤖 Agent (interrupted): {spoken}")
+        try:
+            async with AsyncSessionLocal() as db:
+                await runtime.record_interruption(
+                    agent_id=self.agent_id,
+                    user_input=user_text,
+                    spoken=spoken,
+                    session_id=self.session_id,
+                    persisted=persisted,
+                    started_at=started_at,
+                    db=db,
+                    metadata={"channel": "livekit_voice"}
+                )
+        except Exception as e:
+            print(f"❌ Failed to record interrupted turn: {e}")
 
     async def speak(self, text: str):
         """
@@ -146,31 +277,32 @@ class VoiceAgent:
         """
         self.is_speaking = True
         try:
-            # Generate Audio
-            audio_bytes = await text_to_speech(text, {"voice_provider": "openai"})
-            
-            # Convert bytes to frames and push to LiveKit
-            # This part requires decoding the MP3/WAV from TTS into PCM
-            # For MVP, we'll skip the complex decoding and assume we can push raw bytes 
-            # (LiveKit usually needs PCM). 
-            # TODO: Add pydub or similar to decode MP3 to PCM
-            
-            # For now, we'll just print that we are speaking
-            print(f"🔊 Speaking: {text}")
-            
-            # In a real impl, we would decode audio_bytes to PCM and call:
-            # await self.audio_source.capture_frame(frame)
-            
+            # Playback starts with the first streamed audio
+            await self.play(text_to_speech_stream(text, self.tts_config, "pcm"), text)
         except Exception as e:
             print(f"❌ TTS Error: {e}")
         finally:
             self.is_speaking = False
 
-    async def stop_speaking(self):
+    async def play(self, audio: AsyncIterator[bytes], text: str):
+        """
+        Push streamed 16-bit PCM (at PCM_SAMPLE_RATE) to the audio source
+        """
+        print(f"🔊 Speaking: {text}")
+        await self.audio_output.play(audio, PCM_SAMPLE_RATE)
+
+    def stop_speaking(self):
         """Stop current audio output (Barge-in)"""
+        # Cancelling the turn aborts its LLM and TTS work
+        if self._turn is not None and not self._turn.done():
+            self._turn.cancel()
         self.is_speaking = False
-        # self.audio_source.clear_buffer()
-        pass
+        if self.audio_output:
+            self.audio_output.clear()
 
     async def close(self):
+        self.stop_speaking()
+        for task in list(self._tasks):
+            task.cancel()
+        self.finished.set()
         await self.room.disconnect()
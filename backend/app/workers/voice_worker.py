@@ -0,0 +1,168 @@
+"""
+Voice worker
+One process of the voice worker pool: runs a VoiceAgent per dispatched call
+"""
+
+import asyncio
+import json
+import os
+import signal
+import time
+from typing import Any, Dict
+from ..config import settings
+from ..database import async_engine
+from ..langgraph.llm_registry import llm_registry
+from .dispatch import WORKERS_KEY, NoVoiceWorkerAvailable, queue_key, voice_dispatcher
+from .voice_agent import VoiceAgent
+
+
+# Calls that waited longer than this were abandoned by the caller
+MAX_JOB_AGE_SECONDS = 30.0
+
+
+class VoiceWorker:
+    """
+    Takes calls from its Redis queue, up to ``capacity`` at a time, and
+    advertises its load on every heartbeat. On SIGTERM/SIGINT it stops
+    taking calls, hands queued ones to other workers and waits for active
+    calls to end (up to VOICE_WORKER_DRAIN_TIMEOUT_SECONDS).
+    """
+
+    def __init__(self, worker_id: str, capacity: int):
+        self.worker_id = worker_id
+        self.capacity = max(1, capacity)
+        self.calls: Dict[str, asyncio.Task] = {}
+        self.draining = False
+        self.cpu = 0.0
+        self._cpu_sample = (time.monotonic(), time.process_time())
+        self._slot_free = asyncio.Event()
+        self._wake_heartbeat = asyncio.Event()
+        self._stopped = False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.drain)
+
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        print(f"✅ Voice worker {self.worker_id} ready (pid {os.getpid()}, {self.capacity} calls)")
+        try:
+            await self._accept_loop()
+            await self._requeue()
+            await self._drain_calls()
+        finally:
+            self._stopped = True
+            heartbeat.cancel()
+            await asyncio.wait([heartbeat])
+            await voice_dispatcher.redis.hdel(WORKERS_KEY, self.worker_id)
+            await voice_dispatcher.aclose()
+            await llm_registry.aclose()
+            await async_engine.dispose()
+            print(f"👋 Voice worker {self.worker_id} stopped")
+
+    def drain(self):
+        """Stop taking calls and let active ones finish"""
+        if not self.draining:
+            print(f"⏳ Voice worker {self.worker_id} draining {len(self.calls)} calls")
+            self.draining = True
+            self._slot_free.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Load advertised to the dispatcher"""
+        return {
+            "capacity": self.capacity,
+            "active": len(self.calls),
+            "cpu": round(self.cpu, 3),
+            "draining": self.draining,
+            "pid": os.getpid(),
+            "updated_at": time.time(),
+        }
+
+    async def _accept_loop(self):
+        redis = voice_dispatcher.redis
+        while not self.draining:
+            if len(self.calls) >= self.capacity:
+                self._slot_free.clear()
+                await self._slot_free.wait()
+                continue
+
+            # Short timeout so draining is noticed promptly
+            item = await redis.brpop(queue_key(self.worker_id), timeout=1)
+            if item is None:
+                continue
+            job = json.loads(item[1])
+            if time.time() - job["dispatched_at"] > MAX_JOB_AGE_SECONDS:
+                print(f"⚠️ Skipping stale call for room {job['room_name']}")
+                continue
+            self._start_call(job["room_name"], job["agent_id"])
+
+    def _start_call(self, room_name: str, agent_id: str):
+        print(f"🚀 Worker {self.worker_id} spawning VoiceAgent for room {room_name}")
+        task = asyncio.create_task(VoiceAgent(room_name, agent_id).run())
+        self.calls[room_name] = task
+        self._status_changed()
+
+        def done(task: asyncio.Task):
+            self.calls.pop(room_name, None)
+            self._slot_free.set()
+            self._status_changed()
+            if not task.cancelled() and task.exception():
+                print(f"❌ Call in room {room_name} failed: {task.exception()}")
+
+        task.add_done_callback(done)
+
+    async def _requeue(self):
+        """Hand calls still queued for this worker to other workers"""
+        redis = voice_dispatcher.redis
+        while True:
+            raw = await redis.rpop(queue_key(self.worker_id))
+            if raw is None:
+                return
+            job = json.loads(raw)
+            try:
+                await voice_dispatcher.dispatch(job["room_name"], job["agent_id"], exclude=self.worker_id)
+            except NoVoiceWorkerAvailable:
+                print(f"⚠️ No worker left for room {job['room_name']}, dropping call")
+
+    async def _drain_calls(self):
+        if not self.calls:
+            return
+        await self._publish_status()
+        _, pending = await asyncio.wait(
+            list(self.calls.values()),
+            timeout=settings.VOICE_WORKER_DRAIN_TIMEOUT_SECONDS
+        )
+        if pending:
+            print(f"⚠️ Ending {len(pending)} calls still active after the drain timeout")
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+
+    def _status_changed(self):
+        """Publish right away so a popped call counts before the next heartbeat"""
+        self._wake_heartbeat.set()
+
+    async def _heartbeat_loop(self):
+        # wait_for may swallow a cancel that races the wakeup; the flag may not
+        while not self._stopped:
+            try:
+                await self._publish_status()
+            except Exception as e:
+                print(f"⚠️ Voice worker heartbeat failed: {e}")
+            self._wake_heartbeat.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wake_heartbeat.wait(),
+                    timeout=settings.VOICE_WORKER_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _publish_status(self):
+        # Share of one core used by this process since the last heartbeat
+        wall, cpu = time.monotonic(), time.process_time()
+        last_wall, last_cpu = self._cpu_sample
+        if wall > last_wall:
+            self.cpu = (cpu - last_cpu) / (wall - last_wall)
+        self._cpu_sample = (wall, cpu)
+        await voice_dispatcher.redis.hset(WORKERS_KEY, self.worker_id, json.dumps(self.status()))
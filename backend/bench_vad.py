@@ -0,0 +1,134 @@
+"""
+Check and benchmark the voice activity detector
+Usage: python bench_vad.py [--sample-rate HZ] [--frame-ms MS] [--frames N]
+"""
+
+import argparse
+import time
+import numpy as np
+from app.voice.vad import VoiceActivityDetector
+
+
+def silence(rng: np.random.Generator, sample_rate: int, ms: int) -> np.ndarray:
+    """Quiet background noise"""
+    return rng.normal(0, 20, sample_rate * ms // 1000)
+
+
+def hiss(rng: np.random.Generator, sample_rate: int, ms: int) -> np.ndarray:
+    """Broadband noise just over the speech energy bar; rejected by its zero-crossing rate"""
+    return rng.normal(0, 100, sample_rate * ms // 1000)
+
+
+def tone(sample_rate: int, ms: int, hz: float = 440.0, amplitude: float = 3000.0) -> np.ndarray:
+    t = np.arange(sample_rate * ms // 1000) / sample_rate
+    return amplitude * np.sin(2 * np.pi * hz * t)
+
+
+def speech_burst(rng: np.random.Generator, sample_rate: int, ms: int) -> np.ndarray:
+    """Voiced-like audio: harmonics of a wandering pitch under a syllable-rate envelope"""
+    t = np.arange(sample_rate * ms // 1000) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 1.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.6 + 0.4 * np.abs(np.sin(2 * np.pi * 4 * t))
+    return 2500 * voiced * envelope + rng.normal(0, 20, len(t))
+
+
+def pcm(samples: np.ndarray) -> bytes:
+    return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+
+def run(vad: VoiceActivityDetector, audio: np.ndarray, frame_samples: int):
+    """Feed audio frame by frame; return the start/end transitions with their frame index"""
+    data = pcm(audio)
+    step = frame_samples * 2
+    transitions = []
+    for index, offset in enumerate(range(0, len(data) - step + 1, step)):
+        event = vad.process(data[offset:offset + step])
+        if event is not None and event.kind != "speech":
+            transitions.append((event.kind, index))
+    return transitions
+
+
+def check(sample_rate: int, frame_ms: int):
+    rng = np.random.default_rng(0)
+    frame_samples = sample_rate * frame_ms // 1000
+
+    def detector() -> VoiceActivityDetector:
+        return VoiceActivityDetector(sample_rate, max_frame_samples=frame_samples)
+
+    # Silence and hiss never start an utterance
+    assert run(detector(), silence(rng, sample_rate, 3000), frame_samples) == []
+    audio = np.concatenate([silence(rng, sample_rate, 1000), hiss(rng, sample_rate, 2000)])
+    assert run(detector(), audio, frame_samples) == []
+
+    # A tone is one utterance that ends after the end-of-turn silence
+    audio = np.concatenate([
+        silence(rng, sample_rate, 1000),
+        tone(sample_rate, 800),
+        silence(rng, sample_rate, 1500),
+    ])
+    transitions = run(detector(), audio, frame_samples)
+    assert [kind for kind, _ in transitions] == ["start", "end"], transitions
+    start, end = (index * frame_ms for _, index in transitions)
+    assert 1000 <= start <= 1000 + 60 + frame_ms, start
+    assert 1800 + 700 - frame_ms <= end <= 1800 + 700 + frame_ms, end
+
+    # Two bursts with a short pause are one utterance; a long pause splits them
+    def pause(ms: int) -> np.ndarray:
+        return silence(rng, sample_rate, ms)
+
+    def burst(ms: int) -> np.ndarray:
+        return speech_burst(rng, sample_rate, ms)
+
+    audio = np.concatenate([pause(500), burst(600), pause(300), burst(600), pause(1000)])
+    kinds = [kind for kind, _ in run(detector(), audio, frame_samples)]
+    assert kinds == ["start", "end"], kinds
+    audio = np.concatenate([pause(500), burst(600), pause(1200), burst(600), pause(1000)])
+    kinds = [kind for kind, _ in run(detector(), audio, frame_samples)]
+    assert kinds == ["start", "end", "start", "end"], kinds
+
+    # The utterance includes the pre-roll before the onset
+    vad = detector()
+    run(vad, np.concatenate([pause(1000), burst(400), pause(1000)]), frame_samples)
+    assert len(vad.utterance) // 2 >= sample_rate * (300 + 400) // 1000
+
+    print("✅ VAD transitions: silence, hiss, tone, bursts and pre-roll as expected")
+
+
+def bench(sample_rate: int, frame_ms: int, frames: int):
+    rng = np.random.default_rng(1)
+    frame_samples = sample_rate * frame_ms // 1000
+    # Alternate 2 s of speech and 1 s of silence so every path is exercised
+    cycle = np.concatenate([
+        speech_burst(rng, sample_rate, 2000),
+        silence(rng, sample_rate, 1000),
+    ])
+    data = pcm(np.tile(cycle, frames * frame_samples // len(cycle) + 1))
+    step = frame_samples * 2
+    chunks = [data[offset:offset + step] for offset in range(0, frames * step, step)]
+
+    vad = VoiceActivityDetector(sample_rate, max_frame_samples=frame_samples)
+    for chunk in chunks[:100]:
+        vad.process(chunk)
+
+    started = time.perf_counter()
+    for chunk in chunks:
+        vad.process(chunk)
+    elapsed = time.perf_counter() - started
+    print(f"⏱️  {elapsed / frames * 1e6:.1f} µs per {frame_ms} ms frame at {sample_rate} Hz ({frames} frames)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the voice activity detector")
+    parser.add_argument("--sample-rate", type=int, default=48000, help="Sample rate in Hz")
+    parser.add_argument("--frame-ms", type=int, default=10, help="Frame length in ms")
+    parser.add_argument("--frames", type=int, default=20000, help="Frames to time")
+    args = parser.parse_args()
+
+    check(args.sample_rate, args.frame_ms)
+    bench(args.sample_rate, args.frame_ms, args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Ingest documents into a knowledge base
+Usage: python ingest_kb.py <kb_id> <path> [<path> ...]
+"""
+
+import argparse
+import asyncio
+import itertools
+from app.services.ingestion_service import IngestionService, iter_documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest documents into a knowledge base")
+    parser.add_argument("kb_id", help="Knowledge base ID (stored as kb_id metadata)")
+    parser.add_argument("paths", nargs="+", help=".jsonl/text files or directories")
+    parser.add_argument("--chunk-size", type=int, help="Max characters per chunk")
+    parser.add_argument("--overlap", type=int, help="Characters shared by consecutive chunks")
+    parser.add_argument("--batch-size", type=int, help="Chunks per embedding batch")
+    parser.add_argument("--concurrency", type=int, help="Embedding batches in flight")
+    args = parser.parse_args()
+
+    service = IngestionService(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.overlap,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency
+    )
+    documents = itertools.chain.from_iterable(iter_documents(path) for path in args.paths)
+
+    print(f"Ingesting into knowledge base {args.kb_id}...")
+    stats = asyncio.run(service.ingest(args.kb_id, documents))
+    print(
+        f"Done: {stats['documents']} documents, {stats['chunks']} chunks, "
+        f"{stats['embedded']} embedded, {stats['unchanged']} unchanged, {stats['deleted']} deleted, "
+        f"{stats['duplicates']} duplicates"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Run the voice worker pool
+Usage: python run_voice_workers.py [--workers N] [--capacity C]
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from app.config import settings
+
+
+def worker_main(worker_id: str, capacity: int):
+    """Entry point of one worker process (own event loop, own core)"""
+    import asyncio
+    from app.workers.voice_worker import VoiceWorker
+
+    asyncio.run(VoiceWorker(worker_id, capacity).run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the voice worker pool")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU core)")
+    parser.add_argument("--capacity", type=int, help="Concurrent calls per worker")
+    args = parser.parse_args()
+
+    count = args.workers or settings.VOICE_WORKERS or os.cpu_count() or 1
+    capacity = args.capacity or settings.VOICE_WORKER_CAPACITY
+    context = multiprocessing.get_context("spawn")
+    host = socket.gethostname()
+    processes = {}
+    stopping = False
+
+    def spawn(index: int):
+        # Stable ids let a restarted worker pick up its queue
+        worker_id = f"{host}-{index}"
+        process = context.Process(target=worker_main, args=(worker_id, capacity), name=worker_id)
+        process.start()
+        processes[index] = process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        print("⏳ Draining voice workers...")
+        for process in processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"🚀 Starting {count} voice workers ({capacity} calls each)")
+    for index in range(count):
+        spawn(index)
+
+    while True:
+        alive = False
+        for index, process in list(processes.items()):
+            if process.is_alive():
+                alive = True
+            elif not stopping:
+                print(f"⚠️ Voice worker {process.name} exited ({process.exitcode}), restarting")
+                spawn(index)
+                alive = True
+        if stopping and not alive:
+            break
+        time.sleep(1)
+
+    print("✅ Voice workers stopped")
+
+
+if __name__ == "__main__":
+    main()
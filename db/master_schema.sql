@@ -139,6 +139,8 @@ create table if not exists agent_sessions (
     channel varchar(50) default 'text',
     conversation_history jsonb default '[]'::jsonb,
     context_data jsonb default '{}'::jsonb,
+    history_summary text,
+    summarized_message_count integer default 0,
     message_count integer default 0,
     status varchar(50) default 'active',
     started_at timestamptz default now(),
@@ -160,6 +162,13 @@ create table if not exists agent_messages (
     created_at timestamptz default now()
 );
 
+alter table agent_sessions add column if not exists history_summary text;
+alter table agent_sessions add column if not exists summarized_message_count integer default 0;
+
+-- History reads fetch the latest messages of one session
+create index if not exists idx_agent_messages_session_created
+    on agent_messages (session_id, created_at desc);
+
 -- 7. CHAT SESSIONS (Legacy / Frontend Compatibility)
 -- Kept because frontend services currently query these tables directly in some places
 create table if not exists chat_sessions (
@@ -279,6 +288,22 @@ create trigger update_organizations_updated_at before update on organizations fo
 create trigger update_user_profiles_updated_at before update on user_profiles for each row execute function update_updated_at_column();
 create trigger update_agents_updated_at before update on agents for each row execute function update_updated_at_column();
 
+-- Notify backends caching the SIP routing table (app/services/phone_routing.py)
+create or replace function notify_phone_numbers_changed() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform pg_notify('phone_numbers_changed', old.phone_number);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and (tg_op = 'INSERT' or new.phone_number is distinct from old.phone_number) then
+        perform pg_notify('phone_numbers_changed', new.phone_number);
+    end if;
+    return null;
+end;
+$$ language 'plpgsql';
+
+drop trigger if exists phone_numbers_changed on phone_numbers;
+create trigger phone_numbers_changed after insert or update or delete on phone_numbers for each row execute function notify_phone_numbers_changed();
+
 -- Handle New User
 create or replace function public.handle_new_user() returns trigger as $$
 begin
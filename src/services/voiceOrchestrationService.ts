@@ -204,9 +204,13 @@ export class VoiceOrchestrationService {
         throw new Error(`Voice processing failed: ${response.statusText}`);
       }
 
-      // Get transcription from headers (if backend sends it)
-      const userTranscript = response.headers.get('X-User-Transcript');
-      const agentTranscript = response.headers.get('X-Agent-Transcript');
+      // Get transcription from headers (if backend sends it, percent-encoded)
+      const header = (name: string) => {
+        const value = response.headers.get(name);
+        return value ? decodeURIComponent(value) : null;
+      };
+      const userTranscript = header('X-User-Transcript');
+      const agentTranscript = header('X-Agent-Transcript');
 
       if (userTranscript) {
         this.callbacks.onTranscript('user', userTranscript);